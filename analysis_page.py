@@ -1,10 +1,33 @@
 import streamlit as st
+import json
 import re  # <--- Kita butuh ini untuk membersihkan HTML
+from functools import lru_cache
 
+@st.fragment
 def render(data):
     """
     Menampilkan Dashboard Analisis Mood.
+    Dijalankan sebagai fragment: interaksi di dashboard tidak me-rerun seluruh app.
+    Klik tombol disimpan di st.session_state.generate_requested.
     """
+    # HTML di-memoize berdasarkan isi data (tidak dibangun ulang tiap rerun)
+    st.markdown(build_dashboard_html(data), unsafe_allow_html=True)
+
+    # 5. TOMBOL ACTION
+    st.markdown("<br>", unsafe_allow_html=True)
+    _, col_btn, _ = st.columns([1, 2, 1])
+    
+    with col_btn:
+        if st.button("Generate Recommendations  \u279C", key="gen_btn", use_container_width=True):
+            st.session_state.generate_requested = True
+            st.rerun() # Rerun penuh: main.py yang menjalankan pipeline
+
+def build_dashboard_html(data):
+    return _dashboard_html(json.dumps(data, sort_keys=True))
+
+@lru_cache(maxsize=256)
+def _dashboard_html(data_json):
+    data = json.loads(data_json)
     
     # 1. SIAPKAN DATA
     moods = data.get('detected_moods', ['Neutral'])
@@ -111,15 +134,4 @@ def render(data):
     # Ini mencegah Markdown menganggapnya sebagai Code Block.
     clean_html = re.sub(r'\n\s*', '', html_template)
 
-    # Render HTML yang sudah bersih
-    st.markdown(clean_html, unsafe_allow_html=True)
-
-    # 5. TOMBOL ACTION
-    st.markdown("<br>", unsafe_allow_html=True)
-    _, col_btn, _ = st.columns([1, 2, 1])
-    
-    with col_btn:
-        if st.button("Generate Recommendations  \u279C", key="gen_btn", use_container_width=True):
-            return True
-            
-    return False
\ No newline at end of file
+    return clean_html
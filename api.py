@@ -0,0 +1,259 @@
+# api.py
+"""
+HTTP API headless untuk pipeline mood -> watchlist (tanpa Streamlit), memakai
+services.py yang sama. Jalankan:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+
+Endpoint (JSON body):
+    POST /analyze    {"text": "..."}                      -> hasil analisis mood
+    POST /recommend  {"text": "..."} | {"mood_summary": "..."}
+                                                          -> [{title, reason}]
+    POST /watchlist  {"text": "...", "stream": false}     -> {analysis, movies}
+                     "stream": true -> NDJSON: analysis, movie..., (ranked), done
+    GET  /healthz, GET /metrics (format Prometheus dari tracing.py)
+
+Service bersifat blocking (I/O ke Gemini/TMDB), jadi dijalankan di thread
+pool sendiri; event loop hanya mengatur antrean, batas in-flight dan
+streaming. Request di atas API_MAX_INFLIGHT menunggu paling lama
+API_QUEUE_TIMEOUT lalu ditolak 503 (Retry-After) supaya latensi tetap stabil;
+stream memegang slotnya sampai event terakhir terkirim. Analisis yang gagal
+atau rekomendasi kosong (fallback services) dijawab 502, bukan 200.
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import services
+import tracing
+
+API_WORKERS = int(os.getenv("API_WORKERS", "64"))
+API_MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "256"))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "2"))
+# Kosong = tanpa autentikasi; selain itu daftar key partner dipisah koma (header X-API-Key)
+API_KEYS = {k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()}
+MAX_TEXT_CHARS = 2000
+
+logger = logging.getLogger(__name__)
+
+_pool = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+_inflight = None  # asyncio.Semaphore, dibuat di event loop saat startup
+_STREAM_END = object()
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse yang memegang slot in-flight sampai body selesai dikirim"""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _inflight.release()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers
+
+
+async def _call(fn, *args, **kwargs):
+    """Jalankan fungsi service di thread pool, membawa context tracing"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_pool, lambda: ctx.run(fn, *args, **kwargs))
+
+
+async def _body(request):
+    try:
+        data = await request.json()
+    except Exception:
+        raise ApiError(400, "Body harus JSON")
+    if not isinstance(data, dict):
+        raise ApiError(400, "Body harus JSON object")
+    return data
+
+
+def _text(data, field="text"):
+    text = data.get(field)
+    if not isinstance(text, str) or not text.strip():
+        raise ApiError(422, f"'{field}' wajib diisi")
+    if len(text) > MAX_TEXT_CHARS:
+        raise ApiError(422, f"'{field}' maksimal {MAX_TEXT_CHARS} karakter")
+    return text.strip()
+
+
+async def _run_analysis(text):
+    """run_analysis di thread pool; analisis yang jatuh ke fallback error -> 502"""
+    analysis, candidates = await _call(services.run_analysis, text)
+    if analysis.get("source") == "error":
+        logger.warning("analisis gagal: %s", analysis.get("error"))
+        raise ApiError(502, "Analisis mood gagal, coba lagi", headers={"Retry-After": "1"})
+    return analysis, candidates
+
+
+def _tmdb_key():
+    try:
+        _, tmdb_key = services.configure_apis()
+    except Exception:
+        tmdb_key = None
+    if not tmdb_key:
+        raise ApiError(503, "TMDB_API_KEY belum dikonfigurasi")
+    return tmdb_key
+
+
+def endpoint(stage):
+    """Autentikasi, batas in-flight, tracing context dan error JSON untuk satu route"""
+    def decorator(handler):
+        async def wrapper(request):
+            if API_KEYS and request.headers.get("x-api-key") not in API_KEYS:
+                return JSONResponse({"error": "API key tidak valid"}, status_code=401)
+            try:
+                await asyncio.wait_for(_inflight.acquire(), timeout=API_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return JSONResponse({"error": "Server sedang penuh"}, status_code=503, headers={"Retry-After": "1"})
+            response = None
+            try:
+                tracing.set_context(session=request.headers.get("x-request-id") or uuid.uuid4().hex, stage=stage)
+                response = await handler(request)
+                return response
+            except ApiError as e:
+                return JSONResponse({"error": e.message}, status_code=e.status, headers=e.headers)
+            except Exception:
+                logger.exception("api %s gagal", stage)
+                return JSONResponse({"error": "Internal error"}, status_code=500)
+            finally:
+                # Slot stream dilepas _SlotStreamingResponse setelah body terkirim
+                if not isinstance(response, _SlotStreamingResponse):
+                    _inflight.release()
+        return wrapper
+    return decorator
+
+
+@endpoint("api_analyze")
+async def analyze(request):
+    text = _text(await _body(request))
+    data, _ = await _run_analysis(text)
+    return JSONResponse(data)
+
+
+@endpoint("api_recommend")
+async def recommend(request):
+    data = await _body(request)
+    if data.get("mood_summary"):
+        summary = _text(data, "mood_summary")
+    else:
+        analysis, candidates = await _run_analysis(_text(data))
+        if candidates:
+            return JSONResponse(candidates)
+        summary = analysis.get("summary_text") or data["text"]
+    recs = await _call(services.get_recommendations, summary)
+    if not recs:
+        # get_recommendations mengembalikan [] jika Gemini gagal
+        raise ApiError(502, "Rekomendasi gagal, coba lagi", headers={"Retry-After": "1"})
+    return JSONResponse(recs)
+
+
+@endpoint("api_watchlist")
+async def watchlist(request):
+    data = await _body(request)
+    text = _text(data)
+    tmdb_key = _tmdb_key()
+    analysis, candidates = await _run_analysis(text)
+    summary = analysis.get("summary_text") or text
+
+    if not data.get("stream"):
+        movies = await _call(services.prepare_watchlist, summary, tmdb_key, candidates=candidates, analysis=analysis)
+        return JSONResponse({"analysis": analysis, "movies": movies})
+
+    return _SlotStreamingResponse(
+        _stream_events(analysis, summary, tmdb_key, candidates),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _stream_events(analysis, summary, tmdb_key, candidates):
+    """
+    NDJSON: kartu dikirim begitu lookup TMDB-nya selesai. Generator
+    iter_watchlist berjalan di thread pool dan dihentikan lewat cancel_event
+    jika client memutus koneksi.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancel_event = threading.Event()
+    ctx = contextvars.copy_context()
+
+    def produce():
+        try:
+            for movie in services.iter_watchlist(summary, tmdb_key, candidates, cancel_event):
+                loop.call_soon_threadsafe(queue.put_nowait, movie)
+        except Exception:
+            logger.exception("api stream watchlist gagal")
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+
+    try:
+        yield json.dumps({"type": "analysis", "data": analysis}) + "\n"
+        loop.run_in_executor(_pool, lambda: ctx.run(produce))
+        movies = []
+        while True:
+            movie = await queue.get()
+            if movie is _STREAM_END:
+                break
+            movies.append(movie)
+            yield json.dumps({"type": "movie", "data": movie}) + "\n"
+        if services.RANKING_MODE and movies:
+            ranked = await _call(services.rank_watchlist, analysis, movies, tmdb_key)
+            yield json.dumps({"type": "ranked", "data": ranked}) + "\n"
+        yield json.dumps({"type": "done", "count": len(movies)}) + "\n"
+    finally:
+        cancel_event.set()
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok", "inflight_limit": API_MAX_INFLIGHT})
+
+
+async def metrics(request):
+    return PlainTextResponse(tracing.registry.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _inflight
+    _inflight = asyncio.Semaphore(API_MAX_INFLIGHT)
+    try:
+        await _call(services.configure_apis)
+    except Exception as e:
+        # Tanpa env GEMINI_API_KEY/TMDB_API_KEY: services jatuh ke fallback
+        logger.warning("API key belum lengkap: %s", e)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/analyze", analyze, methods=["POST"]),
+        Route("/recommend", recommend, methods=["POST"]),
+        Route("/watchlist", watchlist, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")))
@@ -1,104 +1,49 @@
 import streamlit as st
 import google.generativeai as genai
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from chat_tools import DiscoverSnapshots, create_tools
+import chat_history
+import posters
+import ratelimit
+import tracing
+import uuid
 
 # --- 1. CONFIG ---
 st.set_page_config(page_title="Moodie AI (Fixed)", page_icon="🎬", layout="wide")
 load_dotenv()
 
-# --- 2. FACTORY FUNCTION UNTUK TOOLS ---
-# Kita membungkus tools di dalam fungsi ini agar API Key "terkunci" di dalamnya.
-# Jadi Gemini tidak perlu mencari session state.
-
-def create_tools(tmdb_api_key):
-    
-    # Helper request sederhana
-    def make_request(endpoint, params={}):
-        base_url = "https://api.themoviedb.org/3"
-        # Menyuntikkan API Key ke setiap request
-        params['api_key'] = tmdb_api_key 
-        params['language'] = 'id-ID'
-        
-        try:
-            print(f"DEBUG: Requesting {endpoint}") # Cek terminal vscode
-            response = requests.get(f"{base_url}{endpoint}", params=params)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"DEBUG ERROR: {e}")
-            return {"error": str(e)}
-
-    # --- DEFINISI TOOLS ---
-    
-    def cari_film_berdasarkan_mood(mood: str):
-        """
-        Mencari rekomendasi film berdasarkan mood/genre.
-        Args: mood (str) - contoh: 'sedih', 'bahagia', 'tegang', 'takut', 'aksi'.
-        """
-        genre_map = {
-            "sedih": 18, "bahagia": 35, "lucu": 35, 
-            "tegang": 53, "takut": 27, "seram": 27, 
-            "romantis": 10749, "aksi": 28, "anime": 16
-        }
-        
-        # Default Drama (18) jika mood tidak ketemu
-        genre_id = 18
-        for k, v in genre_map.items():
-            if k in mood.lower():
-                genre_id = v
-                break
-        
-        # Ubah sort_by dari 'popularity.desc' ke 'vote_average.desc'
-        # Tambahkan 'vote_count.gte' untuk memastikan ratingnya reliable (dari minimal 300 suara)
-        params = {"with_genres": genre_id, "sort_by": "vote_average.desc", "vote_count.gte": 300}
-        data = make_request("/discover/movie", params)
-
-        if "results" in data:
-            return json.dumps(data['results'][:5])
-        return json.dumps(data)
-
-    def cari_judul_spesifik(judul: str):
-        """
-        Mencari detail info film tertentu berdasarkan judul.
-        Args: judul (str) - Judul film.
-        """
-        data = make_request("/search/movie", {"query": judul})
-        if "results" in data:
-            return json.dumps(data['results'][:3])
-        return json.dumps(data)
-
-    def cek_film_trending(waktu: str = "week"):
-        """
-        Melihat film yang sedang populer/trending.
-        Args: waktu (str) - 'day' atau 'week'.
-        """
-        safe_waktu = 'day' if waktu == 'day' else 'week'
-        data = make_request(f"/trending/movie/{safe_waktu}")
-        if "results" in data:
-            return json.dumps(data['results'][:5])
-        return json.dumps(data)
-
-    def get_watch_providers(movie_id: int):
-        """
-        Mendapatkan daftar platform streaming untuk sebuah film berdasarkan ID-nya.
-        Args: movie_id (int) - ID unik dari film di TMDB.
-        """
-        data = make_request(f"/movie/{movie_id}/watch/providers")
-        # Fokus pada hasil untuk Indonesia (ID)
-        if "results" in data and "ID" in data["results"]:
-            providers = data["results"]["ID"]
-            # Ambil dari 'flatrate' (langganan) dulu, lalu 'buy' atau 'rent'
-            provider_names = []
-            if "flatrate" in providers:
-                provider_names.extend([p['provider_name'] for p in providers['flatrate']])
-            return json.dumps(list(set(provider_names))[:3]) # Ambil 3 teratas unik
-        return json.dumps([]) # Kembalikan list kosong jika tidak ada
-
-    # Kembalikan list fungsi yang sudah siap dipakai
-    return [cari_film_berdasarkan_mood, cari_judul_spesifik, cek_film_trending, get_watch_providers]
+# Span chat ditandai per session (lihat tracing.py untuk export metrics)
+if "session_id" not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
+tracing.start_exporter()
+tracing.set_context(session=st.session_state.session_id, stage="chat")
+
+# --- 2. TOOLS (lihat chat_tools.py) ---
+
+@st.cache_resource
+def get_discover_snapshots(tmdb_api_key):
+    """Snapshot discover per genre, satu per proses, di-refresh di background"""
+    snapshots = DiscoverSnapshots(tmdb_api_key)
+    snapshots.start()
+    return snapshots
+
+# Tool loop manual (automatic function calling mati): setiap panggilan model
+# lewat rate limiter Gemini, jadi satu turn dengan N tool memakai N+1 token
+MAX_TOOL_ROUNDS = 5
+
+def send_with_tools(chat_session, tool_library, prompt):
+    """Kirim pesan, jalankan tool yang diminta model, ulangi sampai jawaban teks"""
+    used_tools = []
+    response = ratelimit.gemini_call(chat_session.send_message, prompt)
+    for _ in range(MAX_TOOL_ROUNDS):
+        calls = [part.function_call for part in response.candidates[0].content.parts if part.function_call]
+        if not calls:
+            break
+        used_tools += [fc.name for fc in calls]
+        results = genai.protos.Content(role="user", parts=[tool_library(fc) for fc in calls])
+        response = ratelimit.gemini_call(chat_session.send_message, results)
+    return response, used_tools
 
 # --- 3. SYSTEM INSTRUCTION ---
 
@@ -106,12 +51,12 @@ SYSTEM_PROMPT = """
 Anda adalah Moodie AI. Tugas: Rekomendasi film menggunakan Tools.
 
 ATURAN:
-1. Panggil `cari_film_berdasarkan_mood` jika user curhat perasaan.
-2. Panggil `cari_judul_spesifik` jika user tanya film tertentu.
-3. Panggil `cek_film_trending` jika user tanya yang lagi hits.
-4. Dari hasil pencarian film, ambil `id` film yang paling relevan.
-5. Panggil tool `get_watch_providers` menggunakan `id` film untuk mencari platform streaming.
-6. PENTING: Jika hasil dari `get_watch_providers` adalah list kosong `[]`, artinya film tidak tersedia. Ulangi proses dari langkah 4 dengan film lain dari hasil pencarian awal. JANGAN merekomendasikan film yang tidak punya platform streaming.
+1. Jika user curhat perasaan, panggil `cari_film_tersedia` dengan argumen `mood`.
+2. Jika user tanya film tertentu, panggil `cari_film_tersedia` dengan argumen `judul`.
+3. Panggil `cek_film_trending` jika user tanya yang lagi hits, lalu cek platformnya dengan `get_watch_providers` untuk film yang dipilih.
+4. `cari_film_tersedia` sudah mengecek platform streaming semua kandidat sekaligus: hasilnya HANYA film yang tersedia, dengan field `platform`. Pilih film yang paling relevan dari hasil itu, tidak perlu memanggil `get_watch_providers` lagi.
+5. `cari_film_berdasarkan_mood` dan `cari_judul_spesifik` hanya dipakai jika user minta daftar film tanpa peduli platform.
+6. PENTING: Jika hasil `cari_film_tersedia` adalah list kosong `[]`, tidak ada film yang tersedia. JANGAN merekomendasikan film yang tidak punya platform streaming.
 7. Selalu awali jawaban teks dengan kalimat "Tentu, ini dia rekomendasi film yang cocok untukmu:" sebelum masuk ke detail film.
 8. Untuk `poster_url`, gabungkan 'https://image.tmdb.org/t/p/w500' dengan `poster_path` dari tool. Jika `poster_path` null, gunakan string kosong.
 9. Gunakan data JSON dari semua tools untuk menjawab. Jangan mengarang.
@@ -145,10 +90,8 @@ def parse_final_response(text):
     return text, None
 
 def render_card(data):
-    poster_url = data.get('poster_url')
-    # Fallback jika URL poster tidak ada atau kosong
-    if not poster_url:
-        poster_url = "https://via.placeholder.com/500x750.png?text=No+Image"
+    # Poster lokal ukuran kecil (placeholder bawaan jika URL poster kosong)
+    poster_url = posters.localize_url(data.get('poster_url'), "chat")
     
     platforms = data.get('platform', [])
     platform_html = ""
@@ -200,19 +143,20 @@ if not google_key or not tmdb_key:
     st.stop()
 
 # Init Model & Chat
-if "chat_session" not in st.session_state or st.session_state.chat_session is None:
+if st.session_state.get("chat_session") is None or "tool_library" not in st.session_state:
     try:
         genai.configure(api_key=google_key)
         
         # Buat tools dengan menyuntikkan key TMDB
-        my_tools = create_tools(tmdb_key)
+        my_tools = create_tools(tmdb_key, get_discover_snapshots(tmdb_key))
         
         model = genai.GenerativeModel(
             model_name="gemini-flash-latest",
             system_instruction=SYSTEM_PROMPT,
             tools=my_tools
         )
-        st.session_state.chat_session = model.start_chat(enable_automatic_function_calling=True)
+        st.session_state.chat_session = model.start_chat(enable_automatic_function_calling=False)
+        st.session_state.tool_library = genai.types.FunctionLibrary(my_tools)
         st.session_state.messages = []
         st.toast("System Ready! Tools loaded.", icon="🚀")
     except Exception as e:
@@ -246,16 +190,14 @@ if prompt := st.chat_input("Contoh: Film horor terbaru, atau cari film Interstel
         
         try:
             # Kirim pesan
-            response = st.session_state.chat_session.send_message(prompt)
+            # Lewat rate limiter Gemini bersama (429 diulang dengan backoff)
+            with tracing.span("chat_reply", upstream="gemini"):
+                response, used_tools = send_with_tools(
+                    st.session_state.chat_session, st.session_state.tool_library, prompt
+                )
             
-            # Cek apakah function terpanggil (dari history)
-            tool_msg = ""
-            try:
-                last_req = st.session_state.chat_session.history[-2]
-                if hasattr(last_req.parts[0], 'function_call'):
-                    fname = last_req.parts[0].function_call.name
-                    tool_msg = f"`🛠️ Tool Used: {fname}`"
-            except: pass
+            # Tool yang dipanggil model di turn ini
+            tool_msg = f"`🛠️ Tool Used: {', '.join(used_tools)}`" if used_tools else ""
 
             text, data = parse_final_response(response.text)
             
@@ -266,5 +208,9 @@ if prompt := st.chat_input("Contoh: Film horor terbaru, atau cari film Interstel
             
             st.session_state.messages.append({"role": "assistant", "content": text, "data": data})
             
+            # Jaga history tetap pendek: turn lama + output tool diganti ringkasan
+            chat_history.compact_history(st.session_state.chat_session)
+            st.session_state.messages = chat_history.trim_messages(st.session_state.messages)
+            
         except Exception as e:
             placeholder.error(f"Error: {e}\n\nPastikan TMDB API Key benar.")
\ No newline at end of file
@@ -0,0 +1,266 @@
+# batch.py
+"""
+Batch offline: file teks mood (JSONL atau CSV) -> watchlist yang sudah
+diperkaya TMDB (JSONL), memakai services.py yang sama dengan UI.
+
+    python batch.py input.jsonl output.jsonl
+    python batch.py survey.csv output.jsonl --text-field jawaban --id-field responden
+    python batch.py input.jsonl output.jsonl --pack 10 --concurrency 8 --chunk-size 200
+
+Input dibaca per chunk (tidak dimuat semua ke memori). Tiap chunk:
+  1. teks dipak `--pack` per panggilan Gemini (analisis + 4 rekomendasi).
+     Teks yang tidak terjawab dikirim ulang sebagai pack yang lebih kecil
+     (jawaban rusak -> pack dibelah dua), sisa satu teks lewat jalur biasa;
+  2. judul rekomendasi seluruh chunk di-dedupe sebelum lookup TMDB;
+  3. hasil ditulis urut sesuai input, lalu checkpoint diperbarui.
+Baris yang gagal dianalisis (mis. Gemini error setelah retry) tetap ditulis
+dengan field "error" tanpa "analysis" dan tidak dihitung di rows_done;
+saring baris itu dari output untuk dijalankan ulang.
+Jika proses terhenti, jalankan ulang perintah yang sama: output dipotong
+ke checkpoint terakhir dan baris yang sudah dibaca dilewati (--restart
+untuk mulai dari awal).
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CHECKPOINT_SUFFIX = ".ckpt"
+# Jawaban batch ~250 token per teks; pack besar mendekati batas output model
+MAX_PACK = 10
+TITLE_MEMO_SIZE = 20000  # detail TMDB per judul yang diingat lintas chunk
+
+logger = logging.getLogger(__name__)
+
+
+def read_rows(path, text_field="text", id_field="id"):
+    """Stream baris input sebagai (row_id, text); format dari ekstensi file"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for n, row in enumerate(csv.DictReader(f)):
+                yield row.get(id_field) or str(n), row.get(text_field) or ""
+        return
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield str(n), None
+                continue
+            if isinstance(row, str):
+                yield str(n), row
+            else:
+                yield str(row.get(id_field, n)), row.get(text_field) or ""
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class BatchRunner:
+    def __init__(self, tmdb_key, pack=8, concurrency=4):
+        import cache
+        self.tmdb_key = tmdb_key
+        self.pack = max(1, min(pack, MAX_PACK))
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+        self.titles = cache.MemoryCache(max_entries=TITLE_MEMO_SIZE, ttl=24 * 3600)
+        self.stats = {"rows": 0, "errors": 0, "failed": 0, "gemini_packs": 0, "fallback_rows": 0,
+                      "titles_total": 0, "titles_looked_up": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _analyze_pack(self, texts):
+        """
+        Return list sejajar `texts`: (analysis, recs), atau string error
+        untuk teks yang gagal dianalisis
+        """
+        import services
+        self._count("gemini_packs")
+        try:
+            results = services.analyze_moods_batch(texts)
+        except ValueError as e:
+            # Jawaban bukan JSON (mis. terpotong): diulang dengan pack lebih kecil
+            logger.info("jawaban pack %d teks rusak: %s", len(texts), e)
+            results = [None] * len(texts)
+        except Exception as e:
+            # Gemini tetap gagal setelah retry limiter; memecah pack hanya
+            # melipatgandakan panggilan ke upstream yang sedang bermasalah
+            logger.warning("pack %d teks gagal: %r", len(texts), e)
+            return [f"analisis gagal: {e}"] * len(texts)
+
+        missing = [k for k, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        if len(texts) == 1:
+            results[0] = self._analyze_single(texts[0])
+        elif len(missing) < len(texts):
+            # Sebagian teks tidak terjawab: satu pack lagi berisi sisanya
+            for k, result in zip(missing, self._analyze_pack([texts[k] for k in missing])):
+                results[k] = result
+        else:
+            half = len(texts) // 2
+            results = self._analyze_pack(texts[:half]) + self._analyze_pack(texts[half:])
+        return results
+
+    def _analyze_single(self, text):
+        """Jalur biasa untuk satu teks yang tetap tidak terjawab di pack"""
+        import services
+        self._count("fallback_rows")
+        analysis, recs = services.run_analysis(text)
+        if analysis.get('source') == "error":
+            return analysis.get('error') or "analisis gagal"
+        if not recs:
+            recs = services.get_recommendations(analysis.get('summary_text') or text)
+        if not recs:
+            return "rekomendasi gagal"
+        return analysis, recs
+
+    def _lookup(self, title):
+        import services
+        return title, services.search_tmdb_details(title, self.tmdb_key)
+
+    def process_chunk(self, rows):
+        """rows: [(row_id, text)] -> (record output urut sesuai input, jumlah baris gagal)"""
+        import cache
+        valid = [(i, text.strip()) for i, (_, text) in enumerate(rows) if isinstance(text, str) and text.strip()]
+
+        # 1. Analisis + rekomendasi, beberapa teks per panggilan Gemini
+        analyzed = {}
+        failed = {}
+        packs = [valid[k:k + self.pack] for k in range(0, len(valid), self.pack)]
+        for pack, results in zip(packs, self.pool.map(lambda p: self._analyze_pack([t for _, t in p]), packs)):
+            for (i, _), result in zip(pack, results):
+                if isinstance(result, str):
+                    failed[i] = result
+                else:
+                    analyzed[i] = result
+
+        # 2. Dedupe judul seluruh chunk sebelum TMDB
+        wanted = {}
+        for _, recs in analyzed.values():
+            for rec in recs or []:
+                if isinstance(rec, dict) and rec.get('title'):
+                    self.stats["titles_total"] += 1
+                    wanted.setdefault(cache.normalize_text(rec['title']), rec['title'])
+        missing = [title for key, title in wanted.items() if self.titles.get(key) is None]
+        self.stats["titles_looked_up"] += len(missing)
+        for title, details in self.pool.map(self._lookup, missing):
+            # False = sudah dicari tapi tidak ditemukan (MemoryCache memakai None untuk miss)
+            self.titles.set(cache.normalize_text(title), details or False)
+
+        # 3. Susun record per baris input
+        records = []
+        for i, (row_id, text) in enumerate(rows):
+            self.stats["rows"] += 1
+            if i in failed:
+                self.stats["failed"] += 1
+                records.append({"id": row_id, "text": text, "error": failed[i]})
+                continue
+            if i not in analyzed:
+                self.stats["errors"] += 1
+                records.append({"id": row_id, "text": text, "error": "teks kosong atau baris tidak valid"})
+                continue
+            analysis, recs = analyzed[i]
+            movies = []
+            for rec in recs or []:
+                if not isinstance(rec, dict) or not rec.get('title'):
+                    continue
+                details = self.titles.get(cache.normalize_text(rec['title']))
+                if details:
+                    movies.append(dict(details, reason=rec.get('reason', '')))
+            records.append({"id": row_id, "text": text, "analysis": analysis, "movies": movies})
+        return records, len(failed)
+
+
+def run(input_path, output_path, text_field="text", id_field="id", pack=8, concurrency=4,
+        chunk_size=100, restart=False, limit=None):
+    import services
+
+    _, tmdb_key = services.configure_apis()
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    state = None if restart else load_checkpoint(checkpoint_path)
+    if state and os.path.exists(output_path):
+        # Buang output chunk yang belum sempat di-checkpoint
+        with open(output_path, "r+b") as f:
+            f.truncate(state["output_bytes"])
+        # Checkpoint lama belum memisahkan baris yang dibaca dan yang berhasil
+        state.setdefault("rows_read", state["rows_done"])
+        state.setdefault("rows_failed", 0)
+        logger.info("melanjutkan dari baris %d", state["rows_read"])
+    else:
+        state = {"rows_read": 0, "rows_done": 0, "rows_failed": 0, "output_bytes": 0}
+        open(output_path, "w").close()
+
+    runner = BatchRunner(tmdb_key, pack=pack, concurrency=concurrency)
+    rows = itertools.islice(read_rows(input_path, text_field, id_field), state["rows_read"], limit)
+    start = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            records, failed = runner.process_chunk(chunk)
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            state["rows_read"] += len(chunk)
+            state["rows_done"] += len(chunk) - failed
+            state["rows_failed"] += failed
+            state["output_bytes"] = out.tell()
+            save_checkpoint(checkpoint_path, state)
+            elapsed = time.perf_counter() - start
+            logger.info("%d baris dibaca, %d selesai, %d gagal (%.1f baris/detik, %s)",
+                        state["rows_read"], state["rows_done"], state["rows_failed"],
+                        runner.stats["rows"] / elapsed, runner.stats)
+    runner.pool.shutdown()
+    return runner.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch teks mood -> watchlist (JSONL)")
+    parser.add_argument("input", help="file .jsonl (field text/id) atau .csv")
+    parser.add_argument("output", help="file .jsonl hasil (checkpoint di <output>.ckpt)")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--pack", type=int, default=8, help=f"teks per panggilan Gemini (maks {MAX_PACK})")
+    parser.add_argument("--concurrency", type=int, default=4, help="panggilan Gemini/TMDB paralel")
+    parser.add_argument("--chunk-size", type=int, default=100, help="baris per checkpoint")
+    parser.add_argument("--limit", type=int, help="berhenti setelah baris ke-N input")
+    parser.add_argument("--restart", action="store_true", help="abaikan checkpoint, tulis ulang output")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Tanpa ScriptRunContext, st.error/st.warning di services hanya mencetak peringatan
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    stats = run(args.input, args.output, args.text_field, args.id_field, args.pack,
+                args.concurrency, args.chunk_size, args.restart, args.limit)
+    print(json.dumps(stats))
+    return 0 if stats["rows"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,647 @@
+# benchmark.py
+"""
+Benchmark offline pipeline MoodCine: Gemini diganti FakeModel (latensi dan
+streaming token bisa diatur), TMDB dilayani stub HTTP lokal yang memakai
+payload rekaman dari bench_fixtures/tmdb/ (atau payload sintetis yang
+deterministik jika belum ada rekamannya).
+
+Pemakaian:
+    python benchmark.py                                  # semua skenario
+    python benchmark.py -s analyze_mood -s watchlist -n 50 -c 8
+    python benchmark.py --warm                           # cache tidak dikosongkan
+    python benchmark.py --compare bench_results/<file>.json
+    TMDB_API_KEY=... python benchmark.py --record        # rekam payload TMDB asli
+
+Hasil disimpan di bench_results/<timestamp>.json supaya bisa dibandingkan.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(ROOT, "bench_fixtures", "tmdb")
+RESULTS_DIR = os.path.join(ROOT, "bench_results")
+LIVE_TMDB_URL = "https://api.themoviedb.org/3"
+
+logger = logging.getLogger(__name__)
+
+# Teks mood & judul yang dipakai bergiliran oleh skenario
+MOOD_TEXTS = [
+    "Aku capek banget habis lembur seminggu, pengen yang lucu tapi hangat.",
+    "Lagi patah hati, butuh film yang bikin nangis sekalian.",
+    "Bosen di rumah, pengen yang tegang dan bikin deg-degan.",
+    "Hari ini senang banget baru naik gaji! Mau nonton yang seru.",
+    "Kangen keluarga di kampung, pengen cerita yang menyentuh.",
+    "Susah tidur, butuh sesuatu yang tenang dan indah.",
+    "I feel anxious about tomorrow's exam and need a distraction.",
+    "Weekend sendirian, pengen petualangan fantasi yang panjang.",
+    "sedih",
+    "pengen ketawa",
+]
+TITLES = [
+    "Interstellar", "Parasite", "Spirited Away", "The Dark Knight", "Inception",
+    "Whiplash", "Coco", "La La Land", "Get Out", "Mad Max: Fury Road",
+    "Pengabdi Setan", "The Raid", "Your Name", "Little Women", "Her",
+    "Arrival", "Up", "Joker", "Amélie", "Before Sunrise",
+]
+GENRE_NAMES = {18: "Drama", 35: "Comedy", 53: "Thriller", 27: "Horror", 10749: "Romance", 28: "Action", 16: "Animation", 878: "Science Fiction"}
+PROVIDERS = ["Netflix", "Disney Plus Hotstar", "Prime Video", "Vidio", "Apple TV"]
+# PNG 1x1 untuk endpoint gambar stub
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082"
+)
+
+
+# --- Gemini palsu ---
+
+class FakeQuotaError(Exception):
+    """Meniru google.api_core ResourceExhausted (dibaca ratelimit.classify_gemini_error)"""
+    code = 429
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """
+    Pengganti GenerativeModel. `latency` = waktu sampai token pertama,
+    `tokens_per_sec` = kecepatan sisa jawaban (≈4 karakter per token),
+    dikirim per `chunk_tokens` saat stream=True.
+    """
+
+    def __init__(self, latency=0.4, tokens_per_sec=150, chunk_tokens=8, error_rate=0.0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.chunk_tokens = chunk_tokens
+        self.error_rate = error_rate
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+        time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeQuotaError("429 Resource has been exhausted (fake)")
+        text = respond(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(len(text) / 4 / self.tokens_per_sec)
+        return FakeResponse(text)
+
+    def _stream(self, text):
+        size = self.chunk_tokens * 4
+        for i in range(0, len(text), size):
+            time.sleep(self.chunk_tokens / self.tokens_per_sec)
+            yield FakeResponse(text[i:i + size])
+
+
+class _Part:
+    def __init__(self, text=""):
+        self.text = text
+        self.function_call = None
+
+
+class _Content:
+    def __init__(self, role, parts):
+        self.role = role
+        self.parts = parts
+
+
+class _Candidate:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeChatResponse:
+    def __init__(self, parts):
+        self.candidates = [_Candidate(_Content("model", parts))]
+        self.text = "".join(p.text or "" for p in parts)
+
+
+class FakeChatSession:
+    """
+    Pengganti ChatSession (tanpa automatic function calling) untuk app.py:
+    pesan user dijawab dengan function_call cari_film_tersedia, lalu hasil
+    tool dari tool loop app.py dijawab dengan JSON block.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._history = []
+
+    @property
+    def history(self):
+        return self._history
+
+    @history.setter
+    def history(self, contents):
+        # Seperti genai: dict {"role", "parts"} diubah jadi objek Content
+        self._history = [
+            _Content(c["role"], [_Part(p) for p in c["parts"]]) if isinstance(c, dict) else c
+            for c in contents
+        ]
+
+    def send_message(self, content, request_options=None):
+        import google.generativeai as genai
+        import posters
+        time.sleep(self.model.fake.latency)
+        if isinstance(content, str):
+            words = content.split()
+            call = genai.protos.Part(function_call=genai.protos.FunctionCall(
+                name="cari_film_tersedia", args={"mood": words[0] if words else ""},
+            ))
+            self._history += [_Content("user", [_Part(content)]), _Content("model", [call])]
+            return FakeChatResponse([call])
+
+        movies = json.loads(content.parts[0].function_response.response["result"])
+        if movies:
+            m = movies[0]
+            card = {
+                "title": m.get("title"), "year": m.get("year"),
+                "poster_url": posters.poster_url(m["poster_path"], "modal") if m.get("poster_path") else "",
+                "rating": m.get("rating"), "summary": m.get("overview"),
+                "platform": m.get("platform"), "reason": "Cocok dengan mood kamu.",
+            }
+            text = f"Tentu, ini dia rekomendasi film yang cocok untukmu:\n<<MOVIE_JSON_START>>\n{json.dumps(card)}\n<<MOVIE_JSON_END>>"
+        else:
+            text = "Maaf, belum ada film yang tersedia untuk mood ini."
+        self._history += [content, _Content("model", [_Part(text)])]
+        return FakeChatResponse([_Part(text)])
+
+
+class FakeChatModel:
+    """Pengganti genai.GenerativeModel yang dibuat app.py (hanya start_chat)"""
+
+    fake = FakeModel()
+
+    def __init__(self, model_name=None, system_instruction=None, tools=None, **kwargs):
+        self.tools = tools or []
+
+    def start_chat(self, **kwargs):
+        return FakeChatSession(self)
+
+
+def _seed(text):
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _analysis(text):
+    rnd = random.Random(_seed(text))
+    moods = rnd.sample(["Melancholic", "Exhausted", "Hopeful", "Anxious", "Joyful", "Nostalgic"], 2)
+    genres = rnd.sample(list(GENRE_NAMES.values()), 4)
+    return {
+        "detected_moods": moods,
+        "intensity_score": rnd.randint(30, 95),
+        "thematic_keywords": [f"#{m.lower()}" for m in moods] + ["#healing"],
+        "genre_alignment": [{"genre": g, "score": rnd.randint(20, 95)} for g in genres],
+        "summary_text": f"User feels {moods[0].lower()} and a bit {moods[1].lower()} ({_seed(text) % 997}).",
+    }
+
+
+def _recommendations(text, n=4):
+    rnd = random.Random(_seed(text))
+    return [{"title": t, "reason": f"Cocok untuk suasana hati ini ({i + 1})."} for i, t in enumerate(rnd.sample(TITLES, n))]
+
+
+def respond(prompt):
+    """Jawaban palsu sesuai jenis prompt di services.py"""
+    if "Analyze EACH user text" in prompt:
+        out = []
+        for n, text in re.findall(r"- id (\d+): (.*)", prompt):
+            data = _analysis(text)
+            data["id"] = int(n)
+            data["recommendations"] = _recommendations(text)
+            out.append(data)
+        return json.dumps(out)
+    if "movie curator" in prompt:
+        data = _analysis(prompt)
+        data["recommendations"] = _recommendations(prompt)
+        return json.dumps(data)
+    if "emotional analysis" in prompt:
+        return json.dumps(_analysis(prompt))
+    if "Recommend" in prompt:
+        return json.dumps(_recommendations(prompt))
+    ids = re.findall(r"- id (\d+):", prompt)
+    if ids:
+        return json.dumps({i: "Sebuah kisah yang memeluk lelahmu malam ini." for i in ids})
+    return "Sebuah kisah yang memeluk lelahmu malam ini."
+
+
+# --- Stub TMDB ---
+
+def _movie(title, genre_ids=None):
+    mid = _seed(title.lower()) % 900000 + 1000
+    return {
+        "id": mid,
+        "title": title,
+        "original_title": title,
+        "overview": f"Sinopsis sintetis untuk {title}.",
+        "release_date": f"{1980 + mid % 45}-0{1 + mid % 9}-1{mid % 9}",
+        "vote_average": round(5 + (mid % 45) / 10, 1),
+        "vote_count": 100 + mid % 20000,
+        "popularity": round(10 + (mid % 5000) / 10, 1),
+        "poster_path": f"/bench{mid}.jpg",
+        "genre_ids": genre_ids or [list(GENRE_NAMES)[mid % len(GENRE_NAMES)]],
+    }
+
+
+def synthetic_payload(endpoint, params):
+    """Payload TMDB sintetis berbentuk sama dengan API aslinya"""
+    if endpoint == "/search/movie":
+        query = params.get("query", "")
+        results = [_movie(query), _movie(f"{query} II"), _movie(f"Return of {query}")]
+        return {"page": 1, "results": results, "total_results": len(results), "total_pages": 1}
+    if endpoint == "/discover/movie":
+        genre = int(str(params.get("with_genres", "18")).split(",")[0])
+        page = int(params.get("page", 1))
+        name = GENRE_NAMES.get(genre, "Movie")
+        results = [_movie(f"{name} Story {(page - 1) * 20 + i}", [genre]) for i in range(20)]
+        return {"page": page, "results": results, "total_results": 10000, "total_pages": 500}
+    if endpoint.startswith("/trending/movie/"):
+        return {"page": 1, "results": [_movie(f"Trending Hit {i}") for i in range(20)]}
+    match = re.fullmatch(r"/movie/(\d+)/watch/providers", endpoint)
+    if match:
+        mid = int(match.group(1))
+        if mid % 10 >= 7:
+            return {"id": mid, "results": {}}
+        return {"id": mid, "results": {"ID": {"flatrate": [{"provider_name": PROVIDERS[mid % len(PROVIDERS)]}]}}}
+    match = re.fullmatch(r"/movie/(\d+)", endpoint)
+    if match:
+        m = _movie(f"Movie {match.group(1)}")
+        m["id"] = int(match.group(1))
+        m["genres"] = [{"id": g, "name": GENRE_NAMES.get(g, "")} for g in m.pop("genre_ids")]
+        return m
+    return None
+
+
+def _fixture_path(endpoint, params):
+    import cache
+    return os.path.join(FIXTURES_DIR, hashlib.sha1(cache.make_key(endpoint, params).encode("utf-8")).hexdigest() + ".json")
+
+
+class TMDBStub:
+    """
+    Server HTTP lokal pengganti api.themoviedb.org/3 dan image.tmdb.org/t/p.
+    Urutan jawaban: rekaman di bench_fixtures/tmdb/ -> (mode record) TMDB asli,
+    lalu disimpan sebagai rekaman -> payload sintetis.
+    """
+
+    def __init__(self, latency=0.05, record_key=None):
+        self.latency = latency
+        self.record_key = record_key
+        self.requests = 0
+        self.served_from = {"fixture": 0, "live": 0, "synthetic": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="tmdb-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def payload(self, endpoint, params):
+        path = _fixture_path(endpoint, params)
+        if os.path.exists(path):
+            source = "fixture"
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        elif self.record_key:
+            source = "live"
+            query = dict(params, api_key=self.record_key)
+            response = requests.get(f"{LIVE_TMDB_URL}{endpoint}", params=query, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            os.makedirs(FIXTURES_DIR, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        else:
+            source = "synthetic"
+            data = synthetic_payload(endpoint, params)
+        with self._lock:
+            self.requests += 1
+            self.served_from[source] += 1
+        return data
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path.startswith("/t/p/"):
+                    self._send(200, TINY_PNG, "image/png")
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                endpoint = url.path[len("/3"):] if url.path.startswith("/3/") else url.path
+                params = {k: v[0] for k, v in parse_qs(url.query).items() if k != "api_key"}
+                try:
+                    data = stub.payload(endpoint, params)
+                except Exception as e:
+                    self._send(502, json.dumps({"status_message": str(e)}).encode("utf-8"), "application/json")
+                    return
+                if data is None:
+                    self._send(404, b'{"status_message": "not found"}', "application/json")
+                    return
+                self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# --- Pemasangan stub ke modul aplikasi ---
+
+class Environment:
+    """Stub Gemini + TMDB yang terpasang ke services/cache/posters dalam proses ini"""
+
+    def __init__(self, model, stub, workdir):
+        self.model = model
+        self.stub = stub
+        self.workdir = workdir
+        self.tmdb_key = "bench-tmdb-key"
+
+    def reset_caches(self):
+        """Kosongkan semua cache (mode cold)"""
+        import cache
+        import services
+        import title_index
+        for c in (services._mood_cache, services._recs_cache, services._script_cache):
+            c.clear()
+        cache.get_tmdb_cache().clear()
+        title_index.get_index().clear()
+
+    def close(self):
+        self.stub.stop()
+
+
+def install(gemini_latency=0.4, gemini_tps=150, gemini_error_rate=0.0, tmdb_latency=0.05,
+            record_key=None, keep_ratelimit=False, local_classifier=True):
+    """
+    Arahkan services & chat_tools ke stub. Harus dipanggil sebelum modul
+    aplikasi di-import pertama kali, karena path cache dibaca saat import.
+    """
+    workdir = tempfile.mkdtemp(prefix="moodcine-bench-")
+    stub = TMDBStub(latency=tmdb_latency, record_key=record_key).start()
+    os.environ["TMDB_CACHE_PATH"] = os.path.join(workdir, "tmdb.sqlite3")
+    os.environ["TITLE_INDEX_PATH"] = os.path.join(workdir, "titles.sqlite3")
+    os.environ["TMDB_BASE_URL"] = f"{stub.base_url}/3"
+    os.environ.setdefault("GEMINI_API_KEY", "bench-gemini-key")
+    os.environ.setdefault("TMDB_API_KEY", "bench-tmdb-key")
+    # Tanpa ScriptRunContext, st.error/st.warning di services hanya mencetak peringatan
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    import cache
+    import posters
+    import ratelimit
+    import services
+
+    cache.TMDB_BASE_URL = f"{stub.base_url}/3"
+    posters.TMDB_IMAGE_BASE = f"{stub.base_url}/t/p"
+    posters.POSTER_CACHE_DIR = os.path.join(workdir, "posters")
+    model = FakeModel(gemini_latency, gemini_tps, error_rate=gemini_error_rate)
+    services.get_model = lambda preset="recommendation", model_name=None: model
+    services.LOCAL_CLASSIFIER = local_classifier
+    if not keep_ratelimit:
+        # Yang diukur pipeline kita, bukan antrean limiter
+        for name in list(ratelimit.limiters):
+            ratelimit.limiters[name] = ratelimit.Limiter(name, rate=1e6, burst=1e6)
+    # app.py membuat GenerativeModel sendiri untuk chat agent
+    import google.generativeai as genai
+    FakeChatModel.fake = model
+    genai.GenerativeModel = FakeChatModel
+    genai.configure = lambda **kwargs: None
+    return Environment(model, stub, workdir)
+
+
+# --- Skenario ---
+
+def _scenario_analyze_mood(env, i):
+    import services
+    return services.analyze_mood(f"{MOOD_TEXTS[i % len(MOOD_TEXTS)]} #{i}")
+
+
+def _scenario_get_recommendations(env, i):
+    import services
+    return services.get_recommendations(f"Bench mood summary {i}")
+
+
+def _scenario_search_tmdb_details(env, i):
+    import services
+    return services.search_tmdb_details(TITLES[i % len(TITLES)], env.tmdb_key)
+
+
+def _scenario_watchlist(env, i):
+    import services
+    text = f"{MOOD_TEXTS[i % len(MOOD_TEXTS)]} #{i}"
+    analysis, candidates = services.run_analysis(text)
+    return services.prepare_watchlist(analysis.get("summary_text", text), env.tmdb_key, candidates=candidates, analysis=analysis)
+
+
+def _scenario_chat_tools(env, i):
+    from chat_tools import create_tools
+    cari_mood, cari_judul, trending, providers, tersedia = create_tools(env.tmdb_key)
+    mood = ["sedih", "bahagia", "tegang", "takut", "romantis"][i % 5]
+    title = TITLES[i % len(TITLES)]
+    cari_mood(mood)
+    cari_judul(title)
+    trending("day" if i % 2 else "week")
+    providers(1000 + i)
+    tersedia(mood=mood)
+    return tersedia(judul=title)
+
+
+SCENARIOS = {
+    "analyze_mood": _scenario_analyze_mood,
+    "get_recommendations": _scenario_get_recommendations,
+    "search_tmdb_details": _scenario_search_tmdb_details,
+    "watchlist": _scenario_watchlist,
+    "chat_tools": _scenario_chat_tools,
+}
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+    return {
+        "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+    }
+
+
+def run_scenario(env, name, iterations, concurrency, warm):
+    import chat_tools
+    import tracing
+    fn = SCENARIOS[name]
+    if not warm:
+        env.reset_caches()
+    tracing.registry.reset()
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    payload_before = chat_tools.payload_snapshot()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn(env, i)
+        except Exception as e:
+            logger.debug("%s #%d gagal: %r", name, i, e)
+            with lock:
+                errors += 1
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(iterations)))
+    wall = time.perf_counter() - start
+    payload = {k: v - payload_before[k] for k, v in chat_tools.payload_snapshot().items()}
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(iterations / wall, 2) if wall else 0.0,
+        "latency": percentiles(latencies),
+        "stages": tracing.snapshot(),
+        "tool_payload": payload,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nDibandingkan dengan {baseline_path} (rev {baseline['meta'].get('git_rev')}):")
+    print(f"{'skenario':<22}{'p50 ms':>18}{'p95 ms':>18}{'rps':>16}")
+    for name, cur in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+
+        def delta(a, b):
+            pct = (b - a) / a * 100 if a else 0.0
+            return f"{b:.1f} ({pct:+.0f}%)"
+
+        print(f"{name:<22}{delta(old['latency']['p50_ms'], cur['latency']['p50_ms']):>18}"
+              f"{delta(old['latency']['p95_ms'], cur['latency']['p95_ms']):>18}"
+              f"{delta(old['throughput_rps'], cur['throughput_rps']):>16}")
+
+
+def print_report(results):
+    print(f"\n{'skenario':<22}{'n':>6}{'err':>5}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, r in results["scenarios"].items():
+        lat = r["latency"]
+        print(f"{name:<22}{r['iterations']:>6}{r['errors']:>5}{r['throughput_rps']:>9}"
+              f"{lat['p50_ms']:>10}{lat['p95_ms']:>10}{lat['p99_ms']:>10}")
+        for stage, s in sorted(r["stages"].items()):
+            print(f"    {stage:<52} n={s['count']:<5} p50={s['p50_ms']:<8} p95={s['p95_ms']:<8} p99={s['p99_ms']}")
+        payload = r.get("tool_payload") or {}
+        if payload.get("calls"):
+            print(f"    payload tool: {payload['calls']} respon, {payload['raw_bytes']} -> {payload['sent_bytes']} byte "
+                  f"(~{payload['tokens_saved']} token dihemat)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline MoodCine (stub Gemini + TMDB)")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="default: semua")
+    parser.add_argument("-n", "--iterations", type=int, default=20)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("--warm", action="store_true", help="jangan kosongkan cache sebelum tiap skenario")
+    parser.add_argument("--gemini-latency", type=float, default=0.4, help="detik sampai token pertama")
+    parser.add_argument("--gemini-tps", type=float, default=150, help="token per detik")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="peluang 429 palsu")
+    parser.add_argument("--tmdb-latency", type=float, default=0.05)
+    parser.add_argument("--ratelimit", action="store_true", help="pakai rate limiter asli (GEMINI_RPM/TMDB_RPS)")
+    parser.add_argument("--no-local-classifier", action="store_true")
+    parser.add_argument("--record", action="store_true", help="rekam payload TMDB asli (butuh TMDB_API_KEY)")
+    parser.add_argument("--compare", help="file hasil sebelumnya")
+    parser.add_argument("--output", help="default: bench_results/<timestamp>.json")
+    args = parser.parse_args(argv)
+
+    record_key = os.getenv("TMDB_API_KEY") if args.record else None
+    if args.record and not record_key:
+        parser.error("--record butuh TMDB_API_KEY")
+    env = install(
+        gemini_latency=args.gemini_latency, gemini_tps=args.gemini_tps,
+        gemini_error_rate=args.gemini_error_rate, tmdb_latency=args.tmdb_latency,
+        record_key=record_key, keep_ratelimit=args.ratelimit,
+        local_classifier=not args.no_local_classifier,
+    )
+    try:
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "git_rev": _git_rev(),
+                "python": sys.version.split()[0],
+                "args": vars(args),
+            },
+            "scenarios": {},
+        }
+        for name in args.scenario or list(SCENARIOS):
+            logger.debug("menjalankan %s (%dx, konkurensi %d)", name, args.iterations, args.concurrency)
+            results["scenarios"][name] = run_scenario(env, name, args.iterations, args.concurrency, args.warm)
+        results["meta"]["tmdb_stub"] = {"requests": env.stub.requests, **env.stub.served_from}
+    finally:
+        env.close()
+
+    print_report(results)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+    if args.compare:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+import ratelimit
+import tracing
+
+# Bisa diarahkan ke stub lokal (lihat benchmark.py)
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# Lokasi file cache bersama (dipakai main.py dan app.py sekaligus)
+TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH", os.path.join(".cache", "tmdb.sqlite3"))
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "5000"))
+# Waktu akses hit dikumpulkan di memori dan ditulis sekaligus (bukan commit per hit)
+ACCESS_FLUSH_SIZE = 256
+
+# TTL per endpoint (detik). Dicocokkan berdasarkan prefix endpoint.
+TMDB_TTLS = {
+    "/search/movie": 7 * 24 * 3600,   # hasil pencarian judul hampir tidak pernah berubah
+    "/discover/movie": 12 * 3600,
+    "/trending/movie": 3600,          # trending cepat berganti
+    "/movie/": 24 * 3600,             # detail film & watch providers
+}
+DEFAULT_TTL = 6 * 3600
+NEGATIVE_TTL = 30 * 60  # hasil kosong disimpan lebih singkat
+
+# Param yang tidak ikut jadi bagian key
+_IGNORED_PARAMS = {"api_key"}
+
+
+def _ttl_for(endpoint, data):
+    if _is_empty(data):
+        return NEGATIVE_TTL
+    for prefix, ttl in TMDB_TTLS.items():
+        if endpoint.startswith(prefix):
+            return ttl
+    return DEFAULT_TTL
+
+
+def _is_empty(data):
+    """Respon TMDB tanpa hasil (search kosong, provider kosong, dsb)"""
+    return isinstance(data, dict) and "results" in data and not data["results"]
+
+
+def make_key(endpoint, params):
+    """Key cache = endpoint + params yang dinormalisasi (urut, lowercase, spasi dirapikan)"""
+    norm = {}
+    for k, v in (params or {}).items():
+        if k in _IGNORED_PARAMS or v is None:
+            continue
+        v = str(v)
+        if k == "query":
+            v = " ".join(v.lower().split())
+        norm[k] = v
+    return endpoint + "?" + json.dumps(norm, sort_keys=True, separators=(",", ":"))
+
+
+class TMDBCache:
+    """Cache SQLite on-disk untuk respon TMDB, dengan TTL dan batas jumlah entri."""
+
+    def __init__(self, path=TMDB_CACHE_PATH, max_entries=TMDB_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._lock = threading.Lock()
+        self._accessed = {}  # key -> waktu hit terakhir yang belum ditulis
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        # WAL supaya proses Streamlit lain bisa membaca sambil kita menulis
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS tmdb_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON tmdb_cache(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM tmdb_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                # Entri kadaluarsa dibuang oleh _evict saat set berikutnya
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+            value = json.loads(row[0])
+            self.hits += 1
+            if _is_empty(value):
+                self.negative_hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tmdb_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._evict(now)
+            self._conn.commit()
+
+    def _flush_accessed(self):
+        """Tulis waktu akses yang tertunda (dipanggil dengan lock dipegang, tanpa commit)"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE tmdb_cache SET accessed_at = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self, now):
+        """Buang entri kadaluarsa, lalu yang paling lama tidak diakses jika melebihi batas"""
+        self._conn.execute("DELETE FROM tmdb_cache WHERE expires_at < ?", (now,))
+        count = self._conn.execute("SELECT COUNT(*) FROM tmdb_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM tmdb_cache WHERE key IN "
+                "(SELECT key FROM tmdb_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM tmdb_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM tmdb_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries,
+        }
+
+
+_tmdb_cache = None
+_tmdb_cache_lock = threading.Lock()
+
+
+def get_tmdb_cache():
+    """Instance cache TMDB tunggal per proses"""
+    global _tmdb_cache
+    if _tmdb_cache is None:
+        with _tmdb_cache_lock:
+            if _tmdb_cache is None:
+                _tmdb_cache = TMDBCache()
+    return _tmdb_cache
+
+
+def _fetch(url, params, timeout):
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def tmdb_get(endpoint, params, api_key, budget=None, refresh=False, priority=ratelimit.INTERACTIVE):
+    """
+    GET ke TMDB lewat cache. Error HTTP dilempar (dan tidak disimpan),
+    hasil kosong tetap disimpan dengan TTL pendek. refresh=True selalu
+    mengambil dari network lalu memperbarui cache. Request ke network
+    melewati rate limiter TMDB (429/5xx diulang dengan backoff) dan
+    selesai dalam `budget` detik (default ratelimit.BUDGETS per prioritas).
+    """
+    with tracing.span("tmdb_get", upstream="tmdb", endpoint=endpoint) as sp:
+        tmdb_cache = get_tmdb_cache()
+        key = make_key(endpoint, params)
+        data = None if refresh else tmdb_cache.get(key)
+        if data is not None:
+            sp.tag(cache="hit")
+            return data
+
+        sp.tag(cache="refresh" if refresh else "miss")
+        query = dict(params or {})
+        query["api_key"] = api_key
+        data = ratelimit.tmdb_call(_fetch, f"{TMDB_BASE_URL}{endpoint}", query, priority=priority, budget=budget)
+
+        tmdb_cache.set(key, data, _ttl_for(endpoint, data))
+        return data
+
+
+class MemoryCache:
+    """Cache LRU + TTL in-memory, thread-safe (dipakai bersama oleh semua session Streamlit)."""
+
+    def __init__(self, max_entries=512, ttl=6 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._data),
+        }
+
+
+def normalize_text(text):
+    """Bentuk baku teks user untuk key cache: lowercase, spasi dirapikan"""
+    return " ".join(str(text or "").lower().split())
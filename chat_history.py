@@ -0,0 +1,77 @@
+# chat_history.py
+# Pembatas history chat untuk app.py: N turn terakhir disimpan utuh, turn yang
+# lebih lama (termasuk output tool) diganti satu ringkasan ringkas.
+import re
+
+MAX_FULL_TURNS = 4
+MAX_SUMMARY_CHARS = 2000
+MAX_DISPLAY_MESSAGES = 40
+
+SUMMARY_PREFIX = "[Ringkasan percakapan sebelumnya]\n"
+SUMMARY_ACK = "Oke, saya ingat konteks percakapan ini."
+
+_MOVIE_BLOCK = re.compile(r"<<MOVIE_JSON_START>>.*?<<MOVIE_JSON_END>>", re.DOTALL)
+_MOVIE_TITLE = re.compile(r'"title"\s*:\s*"([^"]+)"')
+
+
+def _text(content):
+    return " ".join(getattr(part, "text", "") or "" for part in content.parts).strip()
+
+
+def _is_user_prompt(content):
+    """Awal sebuah turn: pesan user berisi teks (bukan function_response)"""
+    return content.role == "user" and bool(_text(content))
+
+
+def split_turns(history):
+    turns = []
+    for content in history:
+        if _is_user_prompt(content) or not turns:
+            turns.append([content])
+        else:
+            turns[-1].append(content)
+    return turns
+
+
+def _summarize_turn(turn):
+    user_text = " ".join(_text(turn[0]).split())[:120]
+    reply = next((_text(c) for c in reversed(turn) if c.role == "model" and _text(c)), "")
+    titles = _MOVIE_TITLE.findall(reply)
+    reply = " ".join(_MOVIE_BLOCK.sub("", reply).split())[:120]
+    line = f"- User: {user_text} | Moodie: {reply}"
+    if titles:
+        line += f" | Film direkomendasikan: {', '.join(titles)}"
+    return line
+
+
+def compact_history(chat_session):
+    """
+    Ganti turn lama dengan ringkasan. Return True jika history dipendekkan.
+    Ringkasan dibangun lokal (tanpa panggilan LLM tambahan) dan dibatasi
+    MAX_SUMMARY_CHARS, jadi ukuran history per session tetap terbatas.
+    """
+    turns = split_turns(list(chat_session.history))
+
+    previous = []
+    if turns and _text(turns[0][0]).startswith(SUMMARY_PREFIX):
+        previous = _text(turns[0][0])[len(SUMMARY_PREFIX):].splitlines()
+        turns = turns[1:]
+    if len(turns) <= MAX_FULL_TURNS:
+        return False
+
+    old, recent = turns[:-MAX_FULL_TURNS], turns[-MAX_FULL_TURNS:]
+    lines = previous + [_summarize_turn(t) for t in old]
+    # Buang baris paling lama jika ringkasan melewati batas
+    while len("\n".join(lines)) > MAX_SUMMARY_CHARS and len(lines) > 1:
+        lines.pop(0)
+
+    chat_session.history = [
+        {"role": "user", "parts": [SUMMARY_PREFIX + "\n".join(lines)]},
+        {"role": "model", "parts": [SUMMARY_ACK]},
+    ] + [content for turn in recent for content in turn]
+    return True
+
+
+def trim_messages(messages):
+    """Batasi pesan yang ditampilkan (st.session_state.messages)"""
+    return messages[-MAX_DISPLAY_MESSAGES:]
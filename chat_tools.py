@@ -0,0 +1,270 @@
+# chat_tools.py
+# Tools TMDB untuk chat agent di app.py (dipisah dari app.py supaya bisa
+# dipakai thread refresh snapshot tanpa menjalankan script Streamlit).
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+import ratelimit
+import tracing
+
+# Mood -> genre id TMDB untuk cari_film_berdasarkan_mood
+GENRE_MAP = {
+    "sedih": 18, "bahagia": 35, "lucu": 35, 
+    "tegang": 53, "takut": 27, "seram": 27, 
+    "romantis": 10749, "aksi": 28, "anime": 16
+}
+DEFAULT_GENRE_ID = 18  # Drama
+
+logger = logging.getLogger(__name__)
+
+# Ubah sort_by dari 'popularity.desc' ke 'vote_average.desc'
+# Tambahkan 'vote_count.gte' untuk memastikan ratingnya reliable (dari minimal 300 suara)
+MOOD_DISCOVER_PARAMS = {"sort_by": "vote_average.desc", "vote_count.gte": 300}
+
+# Snapshot discover per genre di-refresh tiap 6 jam
+SNAPSHOT_REFRESH_INTERVAL = 6 * 3600
+
+# Pengecekan watch providers paralel untuk cari_film_tersedia
+PROVIDER_TIMEOUT = 8
+_provider_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="providers")
+
+
+# Proyeksi payload tool: hanya field yang dipakai SYSTEM_PROMPT yang dikirim balik ke Gemini
+OVERVIEW_MAX_CHARS = 160
+BYTES_PER_TOKEN = 4  # perkiraan kasar token Gemini untuk teks JSON
+payload_stats = {"calls": 0, "raw_bytes": 0, "sent_bytes": 0, "tokens_saved": 0}
+_stats_lock = threading.Lock()
+
+
+def project_movie(m):
+    """Record TMDB mentah -> field yang dipakai model (id, judul, tahun, rating, sinopsis pendek, poster)"""
+    overview = m.get('overview') or ""
+    if len(overview) > OVERVIEW_MAX_CHARS:
+        overview = overview[:OVERVIEW_MAX_CHARS].rsplit(" ", 1)[0] + "…"
+    projected = {
+        "id": m.get('id'),
+        "title": m.get('title'),
+        "year": (m.get('release_date') or "")[:4],
+        "rating": round(m.get('vote_average') or 0, 1),
+        "overview": overview,
+        "poster_path": m.get('poster_path'),
+    }
+    if m.get('platform'):
+        projected["platform"] = m['platform']
+    return projected
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_payload(movies, raw=None):
+    """
+    Serialisasi ringkas daftar film untuk respon tool, sekaligus mencatat
+    byte/token yang dihemat di span tool dan di payload_stats. Payload
+    mentah diserialisasi dengan cara yang sama, jadi selisihnya murni dari
+    proyeksi field.
+    """
+    out = _dumps([project_movie(m) for m in movies])
+    raw_bytes = len(_dumps(raw if raw is not None else movies).encode())
+    sent_bytes = len(out.encode())
+    tokens_saved = (raw_bytes - sent_bytes) // BYTES_PER_TOKEN
+    tracing.tag(raw_bytes=raw_bytes, sent_bytes=sent_bytes, tokens_saved=tokens_saved)
+    with _stats_lock:
+        payload_stats["calls"] += 1
+        payload_stats["raw_bytes"] += raw_bytes
+        payload_stats["sent_bytes"] += sent_bytes
+        payload_stats["tokens_saved"] += tokens_saved
+    return out
+
+
+def payload_snapshot():
+    """Salinan total payload_stats (untuk /metrics dan laporan benchmark)"""
+    with _stats_lock:
+        return dict(payload_stats)
+
+
+def tmdb_request(endpoint, params, tmdb_api_key, refresh=False, priority=ratelimit.INTERACTIVE):
+    """Request TMDB (bahasa id-ID) lewat cache bersama; error dikembalikan sebagai dict"""
+    params = dict(params or {})
+    params['language'] = 'id-ID'
+    
+    try:
+        # Lewat cache TMDB bersama (API Key disuntikkan di cache.tmdb_get)
+        return cache.tmdb_get(endpoint, params, tmdb_api_key, refresh=refresh, priority=priority)
+    except Exception as e:
+        tracing.tag(outcome="error", error=type(e).__name__)
+        logger.warning("request TMDB %s gagal: %s", endpoint, e)
+        return {"error": str(e)}
+
+
+def mood_to_genre_id(mood):
+    # Default Drama (18) jika mood tidak ketemu
+    for k, v in GENRE_MAP.items():
+        if k in mood.lower():
+            return v
+    return DEFAULT_GENRE_ID
+
+
+class DiscoverSnapshots:
+    """
+    Hasil /discover/movie untuk setiap genre di GENRE_MAP, disimpan di memori
+    proses dan di-refresh oleh thread background sesuai jadwal.
+    """
+
+    def __init__(self, tmdb_api_key, interval=SNAPSHOT_REFRESH_INTERVAL):
+        self.tmdb_api_key = tmdb_api_key
+        self.interval = interval
+        self.refreshed_at = None
+        self._data = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def genre_ids(self):
+        return sorted(set(GENRE_MAP.values()) | {DEFAULT_GENRE_ID})
+
+    def refresh_all(self):
+        def fetch(genre_id):
+            params = dict(MOOD_DISCOVER_PARAMS, with_genres=genre_id)
+            return genre_id, tmdb_request("/discover/movie", params, self.tmdb_api_key, refresh=True, priority=ratelimit.BACKGROUND)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for genre_id, data in pool.map(fetch, self.genre_ids()):
+                # Snapshot lama tetap dipakai kalau refresh gagal
+                if "results" in data:
+                    with self._lock:
+                        self._data[genre_id] = data
+        self.refreshed_at = time.time()
+
+    def get(self, genre_id):
+        with self._lock:
+            return self._data.get(genre_id)
+
+    def start(self):
+        """Ambil semua snapshot sekarang, lalu refresh berkala di background"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="discover-snapshots", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._stop.wait(self.interval)
+
+
+# --- FACTORY FUNCTION UNTUK TOOLS ---
+# Kita membungkus tools di dalam fungsi ini agar API Key "terkunci" di dalamnya.
+# Jadi Gemini tidak perlu mencari session state.
+
+def create_tools(tmdb_api_key, snapshots=None):
+    
+    # Helper request sederhana
+    def make_request(endpoint, params=None):
+        return tmdb_request(endpoint, params, tmdb_api_key)
+
+    def discover_by_mood(mood):
+        genre_id = mood_to_genre_id(mood)
+        
+        # Jawab dari snapshot yang sudah di-prewarm; request live hanya jika belum ada
+        data = snapshots.get(genre_id) if snapshots else None
+        if data is None:
+            params = dict(MOOD_DISCOVER_PARAMS, with_genres=genre_id)
+            data = make_request("/discover/movie", params)
+        return data
+
+    # --- DEFINISI TOOLS ---
+    
+    @tracing.traced(upstream="tmdb")
+    def cari_film_berdasarkan_mood(mood: str):
+        """
+        Mencari rekomendasi film berdasarkan mood/genre.
+        Args: mood (str) - contoh: 'sedih', 'bahagia', 'tegang', 'takut', 'aksi'.
+        """
+        data = discover_by_mood(mood)
+        if "results" in data:
+            return compact_payload(data['results'][:5])
+        return json.dumps(data)
+
+    @tracing.traced(upstream="tmdb")
+    def cari_judul_spesifik(judul: str):
+        """
+        Mencari detail info film tertentu berdasarkan judul.
+        Args: judul (str) - Judul film.
+        """
+        data = make_request("/search/movie", {"query": judul})
+        if "results" in data:
+            return compact_payload(data['results'][:3])
+        return json.dumps(data)
+
+    @tracing.traced(upstream="tmdb")
+    def cek_film_trending(waktu: str = "week"):
+        """
+        Melihat film yang sedang populer/trending.
+        Args: waktu (str) - 'day' atau 'week'.
+        """
+        safe_waktu = 'day' if waktu == 'day' else 'week'
+        data = make_request(f"/trending/movie/{safe_waktu}")
+        if "results" in data:
+            return compact_payload(data['results'][:5])
+        return json.dumps(data)
+
+    @tracing.traced(upstream="tmdb")
+    def get_watch_providers(movie_id: int):
+        """
+        Mendapatkan daftar platform streaming untuk sebuah film berdasarkan ID-nya.
+        Args: movie_id (int) - ID unik dari film di TMDB.
+        """
+        return json.dumps(provider_names(movie_id)) # List kosong jika tidak ada
+
+    def provider_names(movie_id):
+        data = make_request(f"/movie/{movie_id}/watch/providers")
+        # Fokus pada hasil untuk Indonesia (ID)
+        if "results" in data and "ID" in data["results"]:
+            providers = data["results"]["ID"]
+            # Ambil dari 'flatrate' (langganan) dulu, lalu 'buy' atau 'rent'
+            names = []
+            if "flatrate" in providers:
+                names.extend([p['provider_name'] for p in providers['flatrate']])
+            return list(set(names))[:3] # Ambil 3 teratas unik
+        return []
+
+    @tracing.traced(upstream="tmdb")
+    def cari_film_tersedia(mood: str = "", judul: str = ""):
+        """
+        Mencari film berdasarkan mood ATAU judul, lalu langsung mengecek platform
+        streaming semua kandidat sekaligus. Hanya film yang tersedia di Indonesia
+        yang dikembalikan, lengkap dengan daftar platformnya.
+        Args: mood (str) - contoh: 'sedih', 'tegang'. judul (str) - Judul film.
+        """
+        if judul:
+            data = make_request("/search/movie", {"query": judul})
+            candidates = data.get('results', [])[:3]
+        else:
+            data = discover_by_mood(mood or "")
+            candidates = data.get('results', [])[:5]
+        if "results" not in data:
+            return json.dumps(data) # Error dari TMDB
+
+        # Semua watch providers diambil paralel, bukan satu per satu
+        futures = [tracing.submit(_provider_pool, provider_names, m['id']) for m in candidates]
+        available = []
+        for movie, future in zip(candidates, futures):
+            try:
+                platforms = future.result(timeout=PROVIDER_TIMEOUT)
+            except Exception:
+                continue
+            if platforms:
+                available.append(dict(movie, platform=platforms))
+        return compact_payload(available, raw=candidates)
+
+    # Kembalikan list fungsi yang sudah siap dipakai
+    return [cari_film_berdasarkan_mood, cari_judul_spesifik, cek_film_trending, get_watch_providers, cari_film_tersedia]
@@ -0,0 +1,125 @@
+# jobs.py
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import ratelimit
+import tracing
+
+# Job yang tidak pernah diambil selama ini dianggap milik session yang sudah pergi
+JOB_MAX_AGE = 300
+
+
+class Job:
+    """Satu pekerjaan background milik sebuah session Streamlit."""
+
+    def __init__(self, session_id, name, timeout=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.name = name
+        self.timeout = timeout
+        self.stage = "queued"
+        self.cancel_event = threading.Event()
+        self.created_at = time.monotonic()
+        self.started_at = None  # diisi saat worker mulai menjalankan job
+        self.future = None
+
+    def set_stage(self, stage):
+        """Dipanggil dari thread job untuk melaporkan progres"""
+        self.stage = stage
+
+    def elapsed(self):
+        """Lama job berjalan; waktu antre di pool tidak dihitung"""
+        if self.started_at is None:
+            return 0.0
+        return time.monotonic() - self.started_at
+
+    def expired(self):
+        return self.timeout is not None and not self.done() and self.elapsed() > self.timeout
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout=timeout)
+
+    def cancel(self):
+        # Future yang sudah jalan tidak bisa dibatalkan, jadi fungsi job
+        # wajib mengecek cancel_event di antara tahap-tahapnya.
+        self.cancel_event.set()
+        self.future.cancel()
+
+
+class JobRunner:
+    """
+    Thread pool bersama untuk job background, dicatat per (session_id, name).
+    Job yang ditunggu user (analisis, prefetch watchlist) dan job BACKGROUND
+    (mis. Director's Cut) punya pool sendiri, supaya job background yang
+    lama tidak menahan worker job interaktif. Fungsi job menerima keyword
+    `cancel_event`, dan `on_stage` jika report_stage=True.
+    """
+
+    def __init__(self, max_workers=8, background_workers=2, max_age=JOB_MAX_AGE):
+        self.max_age = max_age
+        self._pools = {
+            ratelimit.INTERACTIVE: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job"),
+            ratelimit.BACKGROUND: ThreadPoolExecutor(max_workers=background_workers, thread_name_prefix="job-bg"),
+        }
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, name, fn, *args, timeout=None, report_stage=False,
+               priority=ratelimit.INTERACTIVE, **kwargs):
+        self.reap()
+        job = Job(session_id, name, timeout)
+        if report_stage:
+            kwargs['on_stage'] = job.set_stage
+        with self._lock:
+            old = self._jobs.pop((session_id, name), None)
+            if old:
+                old.cancel()
+            job.future = tracing.submit(self._pools[priority], self._run, job, fn, *args, cancel_event=job.cancel_event, **kwargs)
+            self._jobs[(session_id, name)] = job
+        return job
+
+    @staticmethod
+    def _run(job, fn, *args, **kwargs):
+        # Context sudah disalin per job (tracing.submit): span di job ditandai nama job
+        tracing.set_context(session=job.session_id, stage=job.name)
+        job.started_at = time.monotonic()
+        if job.stage == "queued":
+            job.set_stage("running")
+        result = fn(*args, **kwargs)
+        job.set_stage("done")
+        return result
+
+    def get(self, session_id, name):
+        with self._lock:
+            return self._jobs.get((session_id, name))
+
+    def pop(self, session_id, name):
+        """Ambil job dan lepaskan dari registry (hasilnya sudah dipakai)"""
+        with self._lock:
+            return self._jobs.pop((session_id, name), None)
+
+    def cancel_session(self, session_id):
+        with self._lock:
+            keys = [k for k in self._jobs if k[0] == session_id]
+            for k in keys:
+                self._jobs.pop(k).cancel()
+
+    def reap(self):
+        """Batalkan job lama yang tidak pernah diambil (session sudah ditutup)"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, job in self._jobs.items() if now - job.created_at > self.max_age]
+            for k in stale:
+                self._jobs.pop(k).cancel()
+
+
+runner = JobRunner()
@@ -1,15 +1,35 @@
 # loader_page.py
 import streamlit as st
 
-def render():
+# Tahap job analisis -> (judul, subjudul, progres %)
+STAGES = {
+    "queued": ("Decoding your emotions...", "Waiting for an available AI worker.", 5),
+    "running": ("Decoding your emotions...", "Preparing your mood profile.", 10),
+    "classifying": ("Decoding your emotions...", "Matching your words against known moods.", 20),
+    "calling_gemini": ("Decoding your emotions...", "Our AI is extracting mood vectors and intensity.", 45),
+    "parsing": ("Almost there...", "Structuring your emotional profile.", 90),
+    "done": ("Done!", "Opening your dashboard.", 100),
+}
+
+@st.fragment(run_every=0.5)
+def render(job):
     """
-    Menampilkan animasi loading spinner dan teks status.
+    Menampilkan animasi loading spinner dan status job analisis.
+    Fragment ini di-poll tiap 0.5 detik tanpa memblokir script; begitu job
+    selesai (atau timeout) seluruh app di-rerun agar main.py pindah halaman.
     Pastikan CSS .loading-container sudah ada di styles.py
     """
-    st.markdown("""
+    title, subtitle, progress = STAGES.get(job.stage, STAGES["running"])
+    st.markdown(f"""
         <div class="loading-container">
             <div class="custom-spinner"></div>
-            <div class="loading-title">Decoding your emotions...</div>
-            <div class="loading-subtitle">Our AI is extracting mood vectors and intensity.</div>
+            <div class="loading-title">{title}</div>
+            <div class="loading-subtitle">{subtitle}</div>
         </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+    _, col, _ = st.columns([1, 2, 1])
+    with col:
+        st.progress(progress)
+
+    if job.done() or job.expired():
+        st.rerun()
@@ -0,0 +1,289 @@
+# loadtest.py
+"""
+Load test sesi Streamlit serentak dalam satu proses, memakai AppTest dan stub
+Gemini/TMDB dari benchmark.py (tanpa API key, tanpa network).
+
+Flow "main": input -> loading -> analysis -> results (main.py).
+Flow "chat": beberapa prompt ke app.py.
+
+Pemakaian:
+    python loadtest.py --sessions 1,5,10,20
+    python loadtest.py --flow chat --sessions 10 --prompts 3
+    python loadtest.py --sessions 20 --gemini-latency 0.8 --think 0.5
+
+Laporan: latensi per halaman (p50/p95/p99 per rerun dan waktu tunggu sampai
+halaman berikutnya), jumlah rerun, puncak thread dan memori per sesi.
+Hasil disimpan di bench_results/loadtest-<timestamp>.json.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+import benchmark
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RUN_TIMEOUT = 60
+POLL_INTERVAL = 0.25  # jeda antar rerun selagi menunggu job (seperti fragment loader)
+MAX_POLLS = 400
+
+logger = logging.getLogger(__name__)
+
+
+def share_apptest_runtime():
+    """
+    AppTest memasang mock Runtime global di awal setiap run dan menghapusnya
+    di akhir, jadi run yang tumpang tindih saling mencabut runtime. Di sini
+    mock terakhir tetap dipakai bersama selama load test berjalan.
+    """
+    from streamlit.runtime import Runtime
+    shared = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            shared["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in shared:
+            return shared["runtime"]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in shared
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def rss_bytes():
+    """Resident memory proses saat ini (Linux /proc; fallback puncak getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Sampler:
+    """Sampling thread & memori proses di background selama load test"""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class SessionResult:
+    def __init__(self, index):
+        self.index = index
+        self.runs = []          # (page saat rerun dimulai, detik)
+        self.waits = {}         # page -> detik sampai pindah ke halaman berikutnya
+        self.error = None
+        self.total = 0.0
+
+    def timed_run(self, at, page):
+        start = time.perf_counter()
+        at.run(timeout=RUN_TIMEOUT)
+        self.runs.append((page, time.perf_counter() - start))
+        if at.exception:
+            raise RuntimeError(f"{page}: {at.exception[0].message}")
+
+
+def _page(at):
+    return at.session_state["page"] if "page" in at.session_state else "input"
+
+
+def walk_main(result, text, think):
+    """Satu user: isi mood, tunggu analisis, generate watchlist, sampai results"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=RUN_TIMEOUT)
+    result.timed_run(at, "input")
+    time.sleep(think)
+
+    at.text_area[0].input(text)
+    next(b for b in at.button if b.label.startswith("Analyze Mood")).click()
+    start = time.perf_counter()
+    result.timed_run(at, "input")
+
+    for _ in range(MAX_POLLS):
+        if _page(at) != "loading":
+            break
+        time.sleep(POLL_INTERVAL)
+        result.timed_run(at, "loading")
+    if _page(at) != "analysis":
+        raise RuntimeError(f"analisis tidak selesai (halaman {_page(at)})")
+    result.waits["loading"] = time.perf_counter() - start
+    time.sleep(think)
+
+    at.button(key="gen_btn").click()
+    start = time.perf_counter()
+    result.timed_run(at, "analysis")
+    if _page(at) != "results":
+        raise RuntimeError(f"watchlist tidak selesai (halaman {_page(at)})")
+    result.waits["analysis"] = time.perf_counter() - start
+    if not at.session_state["results"]:
+        raise RuntimeError("results kosong")
+    time.sleep(think)
+    result.timed_run(at, "results")
+
+
+def walk_chat(result, prompts, think):
+    """Satu user chat: kirim beberapa prompt ke app.py"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=RUN_TIMEOUT)
+    result.timed_run(at, "chat_open")
+    for prompt in prompts:
+        time.sleep(think)
+        at.chat_input[0].set_value(prompt)
+        result.timed_run(at, "chat_reply")
+    messages = at.session_state["messages"]
+    if not any(m.get("data") for m in messages if m["role"] == "assistant"):
+        raise RuntimeError("tidak ada kartu film di jawaban chat")
+
+
+def run_level(env, flow, sessions, think, ramp, prompts, warm):
+    if not warm:
+        env.reset_caches()
+    results = [SessionResult(i) for i in range(sessions)]
+    rss_before = rss_bytes()
+    threads_before = threading.active_count()
+
+    def one(result):
+        rnd = random.Random(result.index)
+        start = time.perf_counter()
+        try:
+            if flow == "main":
+                text = f"{rnd.choice(benchmark.MOOD_TEXTS)} (sesi {result.index})"
+                walk_main(result, text, think)
+            else:
+                walk_chat(result, [rnd.choice(["sedih banget", "lagi tegang", "pengen romantis", "takut"]) for _ in range(prompts)], think)
+        except Exception as e:
+            result.error = str(e)
+            logger.debug("sesi %d gagal: %r", result.index, e)
+        result.total = time.perf_counter() - start
+
+    workers = []
+    with Sampler() as sampler:
+        start = time.perf_counter()
+        for r in results:
+            t = threading.Thread(target=one, args=(r,), name=f"session-{r.index}")
+            t.start()
+            workers.append(t)
+            if ramp:
+                time.sleep(ramp / sessions)
+        for t in workers:
+            t.join()
+        wall = time.perf_counter() - start
+
+    per_page = {}
+    for r in results:
+        for page, seconds in r.runs:
+            per_page.setdefault(page, []).append(seconds)
+    waits = {}
+    for r in results:
+        for page, seconds in r.waits.items():
+            waits.setdefault(page, []).append(seconds)
+    ok = [r for r in results if r.error is None]
+    return {
+        "sessions": sessions,
+        "errors": sessions - len(ok),
+        "error_samples": [r.error for r in results if r.error][:5],
+        "wall_s": round(wall, 3),
+        "session_latency": benchmark.percentiles([r.total for r in ok]),
+        "rerun_latency": {page: dict(benchmark.percentiles(v), runs=len(v)) for page, v in per_page.items()},
+        "page_wait": {page: benchmark.percentiles(v) for page, v in waits.items()},
+        "reruns_per_session": round(sum(len(r.runs) for r in results) / sessions, 1),
+        "threads": {"before": threads_before, "peak": sampler.peak_threads,
+                    "per_session": round((sampler.peak_threads - threads_before) / sessions, 2)},
+        "memory_mb": {"before": round(rss_before / 2**20, 1), "peak": round(sampler.peak_rss / 2**20, 1),
+                      "per_session": round((sampler.peak_rss - rss_before) / 2**20 / sessions, 2)},
+    }
+
+
+def print_level(level):
+    print(f"\n== {level['sessions']} sesi: {level['errors']} gagal, wall {level['wall_s']}s, "
+          f"{level['reruns_per_session']} rerun/sesi")
+    s = level["session_latency"]
+    print(f"   sesi penuh      p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms")
+    for page, w in level["page_wait"].items():
+        print(f"   tunggu {page:<9} p50={w['p50_ms']}ms p95={w['p95_ms']}ms p99={w['p99_ms']}ms")
+    for page, p in level["rerun_latency"].items():
+        print(f"   rerun {page:<10} n={p['runs']:<5} p50={p['p50_ms']}ms p95={p['p95_ms']}ms p99={p['p99_ms']}ms")
+    t, m = level["threads"], level["memory_mb"]
+    print(f"   thread {t['before']} -> puncak {t['peak']} (~{t['per_session']}/sesi), "
+          f"RSS {m['before']} -> {m['peak']} MB (~{m['per_session']} MB/sesi)")
+    for e in level["error_samples"]:
+        print(f"   ! {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test sesi Streamlit serentak (AppTest + stub)")
+    parser.add_argument("--flow", choices=["main", "chat"], default="main")
+    parser.add_argument("--sessions", default="1,5,10", help="jumlah sesi serentak, dipisah koma")
+    parser.add_argument("--think", type=float, default=0.2, help="jeda user antar halaman (detik)")
+    parser.add_argument("--ramp", type=float, default=1.0, help="sebar awal sesi dalam N detik")
+    parser.add_argument("--prompts", type=int, default=2, help="prompt per sesi (flow chat)")
+    parser.add_argument("--warm", action="store_true", help="jangan kosongkan cache antar level")
+    parser.add_argument("--gemini-latency", type=float, default=0.4)
+    parser.add_argument("--gemini-tps", type=float, default=150)
+    parser.add_argument("--tmdb-latency", type=float, default=0.05)
+    parser.add_argument("--ratelimit", action="store_true", help="pakai rate limiter asli")
+    parser.add_argument("--output", help="default: bench_results/loadtest-<timestamp>.json")
+    args = parser.parse_args(argv)
+
+    share_apptest_runtime()
+    env = benchmark.install(
+        gemini_latency=args.gemini_latency, gemini_tps=args.gemini_tps,
+        tmdb_latency=args.tmdb_latency, keep_ratelimit=args.ratelimit,
+    )
+    # Sidebar app.py membaca key Gemini dari API_KEY
+    os.environ.setdefault("API_KEY", os.environ["GEMINI_API_KEY"])
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_rev": benchmark._git_rev(),
+            "python": sys.version.split()[0],
+            "args": vars(args),
+        },
+        "levels": [],
+    }
+    try:
+        for n in [int(x) for x in args.sessions.split(",") if x.strip()]:
+            logger.debug("load test %s dengan %d sesi", args.flow, n)
+            level = run_level(env, args.flow, n, args.think, args.ramp, args.prompts, args.warm)
+            report["levels"].append(level)
+            print_level(level)
+    finally:
+        env.close()
+
+    output = args.output or os.path.join(benchmark.RESULTS_DIR, time.strftime("loadtest-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
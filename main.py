@@ -1,7 +1,9 @@
 # main.py
 import streamlit as st
 from dotenv import load_dotenv
+import logging
 import time
+import uuid
 
 # Import modules
 import styles
@@ -9,9 +11,13 @@ import ui
 import services
 import loader_page
 import analysis_page # <--- IMPORT BARU
+import jobs
+import ratelimit
+import tracing
 
 # SETUP
 load_dotenv()
+logger = logging.getLogger(__name__)
 st.set_page_config(page_title="MoodCine AI", page_icon="🎬", layout="wide")
 
 # STATE
@@ -19,9 +25,39 @@ if 'page' not in st.session_state: st.session_state.page = "input"
 if 'user_prompt' not in st.session_state: st.session_state.user_prompt = ""
 if 'analysis_data' not in st.session_state: st.session_state.analysis_data = None # Simpan data JSON analisis
 if 'results' not in st.session_state: st.session_state.results = None
+if 'candidates' not in st.session_state: st.session_state.candidates = None # Rekomendasi dari mode fused
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex # Pemilik job background
+if 'watchlist_partial' not in st.session_state: st.session_state.watchlist_partial = []
+
+# Endpoint /metrics & log span JSONL (jika METRICS_PORT / TRACE_LOG_PATH di-set)
+tracing.start_exporter()
+
+def current_mood_summary():
+    """Summary untuk rekomendasi; teks user sendiri jika analisis gagal"""
+    data = st.session_state.analysis_data
+    if data.get('source') == "error":
+        return st.session_state.user_prompt
+    return data.get('summary_text', st.session_state.user_prompt)
+
+def start_watchlist_prefetch():
+    """Mulai rekomendasi + TMDB di background selagi user membaca dashboard"""
+    sid = st.session_state.session_id
+    if jobs.runner.get(sid, "watchlist") is not None:
+        return
+    _, tmdb_key = services.configure_apis()
+    mood_summary = current_mood_summary()
+    # Kartu yang sudah jadi masuk ke list ini satu per satu (diisi oleh job)
+    st.session_state.watchlist_partial = []
+    jobs.runner.submit(
+        sid, "watchlist", services.prepare_watchlist,
+        mood_summary, tmdb_key, candidates=st.session_state.candidates,
+        partial=st.session_state.watchlist_partial, analysis=st.session_state.analysis_data,
+        timeout=services.WATCHLIST_TIMEOUT
+    )
 
 def main():
     ui.inject_style(styles.CINEMATIC_CSS)
+    tracing.set_context(session=st.session_state.session_id, stage=st.session_state.page)
     
     # --- PAGE 1: INPUT ---
     if st.session_state.page == "input":
@@ -29,57 +65,100 @@ def main():
         user_text, btn_search = ui.render_search_area()
         
         if btn_search and user_text:
+            # Job dari pencarian sebelumnya tidak relevan lagi
+            jobs.runner.cancel_session(st.session_state.session_id)
             st.session_state.user_prompt = user_text
             st.session_state.page = "loading"
             st.rerun()
 
     # --- PAGE 2: LOADING (PROCESS) ---
     elif st.session_state.page == "loading":
-        loader_page.render()
+        sid = st.session_state.session_id
+        job = jobs.runner.get(sid, "analysis")
         
-        gemini_key, tmdb_key = services.configure_apis()
-        if not gemini_key or not tmdb_key:
-            st.error("API Key missing.")
-            st.stop()
-        else:
-            time.sleep(2) # Delay estetik
+        if job is None:
+            gemini_key, tmdb_key = services.configure_apis()
+            if not gemini_key or not tmdb_key:
+                st.error("API Key missing.")
+                st.stop()
             
-            # 1. Analisis Mood (Dapatkan JSON)
-            data = services.analyze_mood(st.session_state.user_prompt)
+            # 1. Analisis Mood (Dapatkan JSON) sebagai job background
+            job = jobs.runner.submit(
+                sid, "analysis", services.run_analysis, st.session_state.user_prompt,
+                timeout=services.ANALYSIS_TIMEOUT, report_stage=True
+            )
+        
+        if job.done() or job.expired():
+            jobs.runner.pop(sid, "analysis")
+            if job.done():
+                try:
+                    data, candidates = job.result()
+                except Exception as e:
+                    data, candidates = services.analysis_fallback_result(f"System Error: {e}")
+            else:
+                job.cancel()
+                data, candidates = services.analysis_fallback_result("Analysis timed out. Please try again.")
             st.session_state.analysis_data = data
+            st.session_state.candidates = candidates # Kandidat film dari mode fused (atau None)
             
             # Pindah ke halaman Analisis
             st.session_state.page = "analysis"
             st.rerun()
+        
+        # Loader mem-poll status job tanpa memblokir script
+        loader_page.render(job)
 
     # --- PAGE 3: ANALYSIS DASHBOARD ---
     elif st.session_state.page == "analysis":
         # Jangan render header besar, biarkan fokus ke dashboard
         
-        # Render Halaman Analisis
-        is_generated = analysis_page.render(st.session_state.analysis_data)
+        # Error analisis dari thread job ditampilkan di sini (thread script)
+        if st.session_state.analysis_data.get('error'):
+            st.error(f"🚨 {st.session_state.analysis_data['error']}")
+
+        # Prefetch spekulatif: rekomendasi mulai dikerjakan sebelum tombol diklik
+        start_watchlist_prefetch()
+
+        # Render Halaman Analisis (fragment; klik tombol -> generate_requested)
+        analysis_page.render(st.session_state.analysis_data)
         
-        if is_generated:
+        if st.session_state.pop('generate_requested', False):
+            preview = st.empty()
             with st.spinner("Curating your personal watchlist..."):
-                gemini_key, tmdb_key = services.configure_apis()
-                
-                # Gunakan summary text dari hasil analisis sebelumnya untuk mencari film
-                mood_summary = st.session_state.analysis_data.get('summary_text', st.session_state.user_prompt)
-                
-                # 2. Cari Rekomendasi
-                recs = services.get_recommendations(mood_summary)
-                
-                final_data = []
-                for r in recs:
-                    details = services.search_tmdb_details(r['title'], tmdb_key)
-                    if details:
-                        # Gabungkan reason AI
-                        details['reason'] = r['reason']
-                        final_data.append(details)
-                
+                sid = st.session_state.session_id
+                job = jobs.runner.pop(sid, "watchlist")
+                if job is None:
+                    # Prefetch tidak ada (mis. dibatalkan): mulai sekarang, ditunggu dengan cara yang sama
+                    start_watchlist_prefetch()
+                    job = jobs.runner.pop(sid, "watchlist")
+
+                # Isi grid kartu demi kartu selagi pipeline streaming berjalan
+                partial = st.session_state.watchlist_partial
+                shown = 0
+                # Berhenti menunggu jika job melewati WATCHLIST_TIMEOUT
+                while not job.done() and not job.expired():
+                    if len(partial) != shown:
+                        shown = len(partial)
+                        with preview.container():
+                            ui.render_movie_preview(list(partial))
+                    time.sleep(0.2)
+                final_data = None
+                try:
+                    # Sisa waktu job saja
+                    final_data = job.result(timeout=max(0, job.timeout - job.elapsed()))
+                except Exception as e:
+                    job.cancel()
+                    logger.warning("prefetch watchlist gagal: %r", e)
+
+                # Kartu yang sudah jadi tetap dipakai; pipeline tidak dijalankan ulang di thread script
+                final_data = final_data or list(partial)
+
+            if final_data:
                 st.session_state.results = final_data
                 st.session_state.page = "results"
                 st.rerun()
+            preview.empty()
+            st.error("⏳ Your watchlist took too long to prepare. Click the button again to retry.")
 
     # --- PAGE 4: RESULTS ---
     elif st.session_state.page == "results":
@@ -89,11 +168,21 @@ def main():
             st.session_state.page = "input"
             st.session_state.results = None
             st.session_state.analysis_data = None
+            st.session_state.candidates = None
+            jobs.runner.cancel_session(st.session_state.session_id)
             st.rerun()
 
         # Render Grid (Gunakan summary mood sebagai konteks teks)
-        mood_context = st.session_state.analysis_data.get('detected_moods', ['Mood'])[0]
-        ui.render_movie_grid(st.session_state.results, f"Mood: {mood_context}")
+        mood_context = f"Mood: {st.session_state.analysis_data.get('detected_moods', ['Mood'])[0]}"
+        
+        # Siapkan kalimat Director's Cut semua kartu di background (satu panggilan batch)
+        if st.session_state.results and jobs.runner.get(st.session_state.session_id, "scripts") is None:
+            jobs.runner.submit(
+                st.session_state.session_id, "scripts", services.generate_creative_scripts,
+                st.session_state.results, mood_context, priority=ratelimit.BACKGROUND
+            )
+        
+        ui.render_movie_grid(st.session_state.results, mood_context)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
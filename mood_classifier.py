@@ -0,0 +1,212 @@
+# mood_classifier.py
+"""
+Classifier mood lokal untuk input pendek ("sedih", "capek kerja", "mau yang seram").
+Leksikon bilingual (ID/EN) + model vektor n-gram karakter, jadi typo dan
+huruf yang dipanjangkan ("sedihh", "bosennn") tetap terbaca. Mengembalikan skema
+yang sama dengan services.analyze_mood, atau None jika tidak yakin.
+"""
+import re
+import zlib
+
+import numpy as np
+
+# Input lebih panjang dari ini diserahkan ke Gemini
+MAX_CONTENT_TOKENS = 6
+# Batas minimal confidence agar hasil lokal dipakai
+MIN_CONFIDENCE = 0.75
+# Kemiripan minimal token dengan kata leksikon (cosine n-gram)
+FUZZY_MIN_SIM = 0.6
+
+_DIM = 2048
+_NGRAM = 3
+
+MOODS = {
+    "sad": {
+        "labels": ["Sad", "Melancholic"],
+        "words": ["sedih", "galau", "nangis", "menangis", "kecewa", "patah hati", "sendu",
+                  "kesepian", "sad", "heartbroken", "cry", "crying", "lonely", "down", "depressed"],
+        "genres": {"Drama": 90, "Romance": 55, "Comedy": 35, "Family": 30},
+        "keywords": ["#healing", "#melancholy", "#comfort"],
+        "need": "a moving, comforting story",
+    },
+    "happy": {
+        "labels": ["Happy", "Cheerful"],
+        "words": ["bahagia", "senang", "seneng", "gembira", "ceria", "lucu", "ketawa", "komedi",
+                  "happy", "cheerful", "excited", "funny", "comedy", "fun"],
+        "genres": {"Comedy": 90, "Family": 60, "Animation": 55, "Romance": 40},
+        "keywords": ["#feelgood", "#laughter", "#joy"],
+        "need": "a light, feel-good movie",
+    },
+    "scared": {
+        "labels": ["Spooked", "Thrill-seeking"],
+        "words": ["seram", "serem", "takut", "horor", "hantu", "mistis",
+                  "horror", "scary", "creepy", "ghost", "spooky"],
+        "genres": {"Horror": 95, "Thriller": 70, "Mystery": 50, "Drama": 15},
+        "keywords": ["#horror", "#chills", "#darkness"],
+        "need": "a scary, atmospheric movie",
+    },
+    "tense": {
+        "labels": ["Tense", "Curious"],
+        "words": ["tegang", "menegangkan", "deg-degan", "misteri", "penasaran",
+                  "thriller", "suspense", "mystery", "tense", "twist"],
+        "genres": {"Thriller": 90, "Mystery": 75, "Crime": 55, "Action": 40},
+        "keywords": ["#suspense", "#mystery", "#plottwist"],
+        "need": "a gripping, suspenseful movie",
+    },
+    "romantic": {
+        "labels": ["Romantic", "Longing"],
+        "words": ["romantis", "cinta", "jatuh cinta", "kasmaran", "baper", "pacar", "rindu", "kangen",
+                  "romantic", "romance", "love", "crush", "miss"],
+        "genres": {"Romance": 95, "Drama": 60, "Comedy": 45, "Music": 20},
+        "keywords": ["#love", "#romance", "#butterflies"],
+        "need": "a warm romantic movie",
+    },
+    "energetic": {
+        "labels": ["Energetic", "Adventurous"],
+        "words": ["aksi", "semangat", "adrenalin", "seru", "berantem", "tarung", "petualangan",
+                  "action", "energetic", "adrenaline", "epic", "adventure", "pumped"],
+        "genres": {"Action": 95, "Adventure": 70, "Science Fiction": 50, "Thriller": 40},
+        "keywords": ["#adrenaline", "#action", "#epic"],
+        "need": "a high-energy action movie",
+    },
+    "tired": {
+        "labels": ["Exhausted", "Stressed"],
+        "words": ["capek", "cape", "capai", "lelah", "penat", "stres", "stress", "suntuk", "kerja", "lembur",
+                  "burnout", "tired", "exhausted", "overworked", "work"],
+        "genres": {"Comedy": 85, "Animation": 60, "Family": 55, "Drama": 30},
+        "keywords": ["#unwind", "#relax", "#selfcare"],
+        "need": "a relaxing, easy-going movie",
+    },
+    "bored": {
+        "labels": ["Bored", "Restless"],
+        "words": ["bosan", "bosen", "gabut", "jenuh", "bored", "boring", "restless"],
+        "genres": {"Adventure": 80, "Comedy": 70, "Action": 60, "Fantasy": 45},
+        "keywords": ["#escape", "#adventure", "#fun"],
+        "need": "an exciting escape from routine",
+    },
+    "angry": {
+        "labels": ["Angry", "Frustrated"],
+        "words": ["marah", "kesal", "kesel", "emosi", "benci", "sebel", "sebal",
+                  "angry", "mad", "annoyed", "frustrated", "furious"],
+        "genres": {"Action": 90, "Thriller": 65, "Crime": 55, "Comedy": 30},
+        "keywords": ["#catharsis", "#revenge", "#release"],
+        "need": "a cathartic, intense movie",
+    },
+}
+
+_STOPWORDS = {
+    "aku", "saya", "gue", "gw", "gua", "lagi", "lg", "mau", "pengen", "pingin", "ingin", "yang", "yg",
+    "film", "nonton", "aja", "saja", "buat", "untuk", "di", "ke", "dan", "abis", "habis", "nih",
+    "sih", "deh", "dong", "kok", "hari", "ini", "rasanya", "merasa", "lagi", "sedang", "tolong", "cari",
+    "i", "im", "am", "feel", "feeling", "want", "a", "an", "the", "something", "movie", "me", "my",
+    "is", "today", "need", "some", "and", "to",
+}
+_INTENSIFIERS = {"banget", "bgt", "sangat", "sekali", "parah", "bener", "very", "so", "really", "super", "extremely"}
+_SOFTENERS = {"agak", "sedikit", "dikit", "rada", "kinda", "bit", "slightly"}
+
+
+def _ngram_vector(word):
+    """Vektor hashing n-gram karakter (ternormalisasi) untuk satu kata"""
+    vec = np.zeros(_DIM, dtype=np.float32)
+    padded = f"<{word}>"
+    for i in range(len(padded) - _NGRAM + 1):
+        vec[zlib.crc32(padded[i:i + _NGRAM].encode()) % _DIM] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _build_lexicon():
+    words, moods = [], []
+    for mood, spec in MOODS.items():
+        for w in spec["words"]:
+            words.append(w)
+            moods.append(mood)
+    matrix = np.stack([_ngram_vector(w) for w in words])
+    return words, np.array(moods), matrix
+
+
+_LEX_WORDS, _LEX_MOODS, _LEX_MATRIX = _build_lexicon()
+_MOOD_NAMES = list(MOODS)
+
+
+def _tokenize(text):
+    text = text.lower()
+    # Frasa multi-kata ("patah hati", "jatuh cinta") digabung jadi satu token
+    for w in _LEX_WORDS:
+        if " " in w and w in text:
+            text = text.replace(w, w.replace(" ", "_"))
+    return [t.replace("_", " ") for t in re.findall(r"[a-z_\-]+", text)]
+
+
+def _squeeze(token):
+    """'sedihhh' -> 'sedih', 'bosennn' -> 'bosen'"""
+    return re.sub(r"(.)\1{2,}", r"\1", token)
+
+
+def classify(text):
+    """
+    Klasifikasi cepat. Return dict berskema analyze_mood (+ 'source' dan
+    'confidence'), atau None jika input panjang/ambigu sehingga perlu Gemini.
+    """
+    tokens = _tokenize(text or "")
+    content = [t for t in tokens if t not in _STOPWORDS and t not in _INTENSIFIERS and t not in _SOFTENERS]
+    if not content or len(content) > MAX_CONTENT_TOKENS:
+        return None
+
+    squeezed = [_squeeze(t) for t in content]
+    # Satu perkalian matriks: kemiripan setiap token dengan seluruh leksikon
+    sims = np.stack([_ngram_vector(t) for t in squeezed]) @ _LEX_MATRIX.T
+    best_idx = sims.argmax(axis=1)
+    best_sim = sims[np.arange(len(content)), best_idx]
+
+    matched = best_sim >= FUZZY_MIN_SIM
+    if not matched.any():
+        return None
+
+    scores = np.zeros(len(_MOOD_NAMES), dtype=np.float32)
+    for idx, sim in zip(best_idx[matched], best_sim[matched]):
+        scores[_MOOD_NAMES.index(_LEX_MOODS[idx])] += sim
+
+    order = scores.argsort()[::-1]
+    top = _MOOD_NAMES[order[0]]
+    coverage = matched.mean()
+    dominance = scores[order[0]] / scores.sum()
+    confidence = float(coverage * dominance * best_sim[matched].mean())
+    if confidence < MIN_CONFIDENCE:
+        return None
+
+    second = _MOOD_NAMES[order[1]] if scores[order[1]] > 0 else None
+    return _build_result(text, tokens, top, second, confidence)
+
+
+def _build_result(text, tokens, top, second, confidence):
+    spec = MOODS[top]
+
+    intensity = 60
+    intensity += 15 * sum(t in _INTENSIFIERS for t in tokens)
+    intensity -= 20 * sum(t in _SOFTENERS for t in tokens)
+    intensity += 5 * min(3, text.count("!"))
+    if any(_squeeze(t) != t for t in tokens):
+        intensity += 10
+    intensity = max(10, min(100, intensity))
+
+    genres = dict(spec["genres"])
+    moods = list(spec["labels"])
+    if second:
+        moods[1] = MOODS[second]["labels"][0]
+        for g, score in MOODS[second]["genres"].items():
+            genres[g] = max(genres.get(g, 0), score // 2)
+    genre_alignment = [
+        {"genre": g, "score": s}
+        for g, s in sorted(genres.items(), key=lambda kv: kv[1], reverse=True)[:4]
+    ]
+
+    return {
+        "detected_moods": moods,
+        "intensity_score": intensity,
+        "thematic_keywords": list(spec["keywords"]),
+        "genre_alignment": genre_alignment,
+        "summary_text": f"The user feels {spec['labels'][0].lower()} and wants {spec['need']}.",
+        "source": "local",
+        "confidence": round(confidence, 2),
+    }
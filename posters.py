@@ -0,0 +1,156 @@
+# posters.py
+# Proxy poster lokal: ukuran TMDB per konteks, cache gambar on-disk yang
+# dibatasi ukurannya, dan placeholder bawaan. File di ./static dilayani
+# Streamlit di /app/static (lihat .streamlit/config.toml). Unduhan hanya
+# berjalan di background; selama belum ada di cache, UI memakai URL TMDB.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p"
+
+# Ukuran gambar TMDB per konteks tampilan
+POSTER_SIZES = {
+    "grid": "w342",   # kartu 4 kolom
+    "modal": "w500",  # dialog detail
+    "chat": "w185",   # kartu chat app.py (lebar 150px)
+}
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+POSTER_CACHE_DIR = os.path.join(STATIC_DIR, "posters")
+PLACEHOLDER_FILE = os.path.join(STATIC_DIR, "poster_placeholder.png")
+PLACEHOLDER_URL = "app/static/poster_placeholder.png"
+
+POSTER_CACHE_MAX_BYTES = int(os.getenv("POSTER_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+POSTER_TIMEOUT = 5
+# Unduhan yang gagal tidak dicoba lagi selama ini (detik)
+FAILED_TTL = 300
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="posters")
+_lock = threading.Lock()
+_downloads_since_evict = 0
+_pending = set()  # nama file yang sedang diunduh
+_failed = {}      # nama file -> waktu (monotonic) boleh dicoba lagi
+
+
+def poster_url(poster_path, context="grid"):
+    """URL TMDB dengan ukuran yang sesuai konteks"""
+    return f"{TMDB_IMAGE_BASE}/{POSTER_SIZES[context]}{poster_path}"
+
+
+def _cache_name(poster_path, context):
+    return f"{POSTER_SIZES[context]}_{poster_path.strip('/').replace('/', '_')}"
+
+
+def poster_file(poster_path, context="grid"):
+    """
+    Path file poster lokal jika sudah ada di cache. Jika belum, URL TMDB
+    langsung dikembalikan (tanpa menunggu) dan unduhan dijadwalkan di
+    background. Tanpa poster -> placeholder bawaan.
+    """
+    if not poster_path:
+        return PLACEHOLDER_FILE
+    path = os.path.join(POSTER_CACHE_DIR, _cache_name(poster_path, context))
+    if os.path.exists(path):
+        return path
+    prefetch(poster_path, (context,))
+    return poster_url(poster_path, context)
+
+
+def static_url(poster_path, context="chat"):
+    """URL untuk tag <img> HTML: file cache lokal di /app/static, URL TMDB selama belum ter-cache, atau placeholder"""
+    if not poster_path:
+        return PLACEHOLDER_URL
+    path = poster_file(poster_path, context)
+    if path.startswith(POSTER_CACHE_DIR):
+        return f"app/static/posters/{os.path.basename(path)}"
+    return path
+
+
+def localize_url(url, context="chat"):
+    """URL poster TMDB apa pun (mis. dari jawaban model) -> versi lokal ukuran konteks"""
+    if not url:
+        return PLACEHOLDER_URL
+    if not url.startswith(TMDB_IMAGE_BASE):
+        return url
+    poster_path = "/" + url.rstrip("/").rsplit("/", 1)[-1]
+    return static_url(poster_path, context)
+
+
+def prefetch(poster_path, contexts=("grid",)):
+    """Unduh poster di background (sekali per file; yang baru gagal dilewati dulu)"""
+    if not poster_path:
+        return
+    now = time.monotonic()
+    for context in contexts:
+        name = _cache_name(poster_path, context)
+        path = os.path.join(POSTER_CACHE_DIR, name)
+        if os.path.exists(path):
+            continue
+        with _lock:
+            if name in _pending or _failed.get(name, 0) > now:
+                continue
+            _pending.add(name)
+        _pool.submit(_fetch, poster_path, context, name, path)
+
+
+def _fetch(poster_path, context, name, path):
+    try:
+        _download(poster_path, context, path)
+    except Exception as e:
+        logger.warning("poster %s gagal diunduh: %s", name, e)
+        now = time.monotonic()
+        with _lock:
+            if len(_failed) > 1024:
+                for key in [k for k, until in _failed.items() if until <= now]:
+                    del _failed[key]
+            _failed[name] = now + FAILED_TTL
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _download(poster_path, context, path):
+    global _downloads_since_evict
+    response = requests.get(poster_url(poster_path, context), timeout=POSTER_TIMEOUT)
+    response.raise_for_status()
+    os.makedirs(POSTER_CACHE_DIR, exist_ok=True)
+    # Tulis ke file sementara lalu rename, supaya tidak ada file setengah jadi
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(tmp_path, path)
+
+    with _lock:
+        _downloads_since_evict += 1
+        if _downloads_since_evict < 20:
+            return
+        _downloads_since_evict = 0
+    _evict()
+
+
+def _evict():
+    """Hapus poster paling lama jika total cache melebihi POSTER_CACHE_MAX_BYTES"""
+    with _lock:
+        entries = []
+        for name in os.listdir(POSTER_CACHE_DIR):
+            full = os.path.join(POSTER_CACHE_DIR, name)
+            if name.endswith(".tmp"):
+                continue
+            stat = os.stat(full)
+            entries.append((stat.st_mtime, stat.st_size, full))
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in sorted(entries):
+            if total <= POSTER_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
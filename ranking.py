@@ -0,0 +1,105 @@
+# ranking.py
+"""
+Ranking kandidat film berdasarkan genre_alignment hasil analyze_mood.
+Semua kandidat dinilai sekaligus dengan NumPy (ratusan film = mikrodetik).
+"""
+import numpy as np
+
+# Genre film TMDB (nama Inggris + alias Indonesia) -> genre id
+TMDB_GENRES = {
+    "action": 28, "aksi": 28,
+    "adventure": 12, "petualangan": 12,
+    "animation": 16, "animasi": 16, "anime": 16,
+    "comedy": 35, "komedi": 35,
+    "crime": 80, "kriminal": 80,
+    "documentary": 99, "dokumenter": 99,
+    "drama": 18,
+    "family": 10751, "keluarga": 10751,
+    "fantasy": 14, "fantasi": 14,
+    "history": 36, "sejarah": 36,
+    "horror": 27, "horor": 27,
+    "music": 10402, "musik": 10402,
+    "mystery": 9648, "misteri": 9648,
+    "romance": 10749, "romantis": 10749,
+    "science fiction": 878, "sci-fi": 878, "fiksi ilmiah": 878,
+    "thriller": 53,
+    "war": 10752, "perang": 10752,
+    "western": 37,
+}
+GENRE_IDS = sorted(set(TMDB_GENRES.values()))
+_GENRE_COL = {gid: i for i, gid in enumerate(GENRE_IDS)}
+
+# Bobot komponen skor akhir
+WEIGHTS = {"genre": 0.55, "rating": 0.30, "popularity": 0.10, "llm_pick": 0.05}
+# Jumlah vote minimum untuk Bayesian rating (sama dengan filter tool chat di app.py)
+MIN_VOTES = 300
+
+
+def genre_id(name):
+    return TMDB_GENRES.get(str(name or "").strip().lower())
+
+
+def genre_weights(genre_alignment):
+    """genre_alignment [{genre, score}] -> vektor bobot 0..1 per kolom GENRE_IDS"""
+    w = np.zeros(len(GENRE_IDS), dtype=np.float32)
+    for g in genre_alignment or []:
+        gid = genre_id(g.get("genre"))
+        if gid is not None:
+            w[_GENRE_COL[gid]] = max(w[_GENRE_COL[gid]], float(g.get("score", 0)) / 100.0)
+    return w
+
+
+def rank_candidates(candidates, genre_alignment, top_k=8):
+    """
+    Nilai semua kandidat sekaligus. Kandidat memakai format kartu dari
+    services.search_tmdb_details (genre_ids, rating, vote_count, popularity).
+    Return top-k: list of (candidate, score, breakdown).
+    """
+    n = len(candidates)
+    if n == 0:
+        return []
+
+    G = np.zeros((n, len(GENRE_IDS)), dtype=np.float32)
+    for i, c in enumerate(candidates):
+        for gid in c.get("genre_ids") or []:
+            col = _GENRE_COL.get(gid)
+            if col is not None:
+                G[i, col] = 1.0
+    rating = np.array([c.get("rating") or 0 for c in candidates], dtype=np.float32)
+    votes = np.array([c.get("vote_count") or 0 for c in candidates], dtype=np.float32)
+    popularity = np.array([c.get("popularity") or 0 for c in candidates], dtype=np.float32)
+    llm_pick = np.array([1.0 if c.get("reason") else 0.0 for c in candidates], dtype=np.float32)
+
+    # Kecocokan genre: cosine antara genre film dan bobot mood
+    w = genre_weights(genre_alignment)
+    w_norm = np.linalg.norm(w)
+    g_norm = np.linalg.norm(G, axis=1)
+    genre_fit = (G @ w) / np.maximum(g_norm * w_norm, 1e-6) if w_norm else np.zeros(n, dtype=np.float32)
+
+    # Bayesian rating: film dengan sedikit vote ditarik ke rata-rata pool
+    mean_rating = float(rating[votes > 0].mean()) if (votes > 0).any() else 0.0
+    bayes = (votes / (votes + MIN_VOTES)) * rating + (MIN_VOTES / (votes + MIN_VOTES)) * mean_rating
+    bayes = bayes / 10.0
+
+    pop = np.log1p(popularity)
+    pop = pop / pop.max() if pop.max() > 0 else pop
+
+    parts = {
+        "genre": genre_fit,
+        "rating": bayes,
+        "popularity": pop,
+        "llm_pick": llm_pick,
+    }
+    score = sum(WEIGHTS[k] * v for k, v in parts.items())
+
+    k = min(top_k, n)
+    top = np.argpartition(-score, k - 1)[:k]
+    top = top[np.argsort(-score[top])]
+    return [
+        (
+            candidates[i],
+            float(score[i]),
+            {name: round(float(values[i]), 3) for name, values in parts.items()},
+        )
+        for i in top
+    ]
@@ -0,0 +1,239 @@
+# ratelimit.py
+# Pembatas laju sisi klien per upstream (Gemini, TMDB): token bucket bersama
+# untuk semua session, antrean berprioritas (analisis interaktif didahulukan
+# dari pekerjaan background seperti script Director's Cut), dan retry dengan
+# exponential backoff + jitter yang menghormati Retry-After. Setiap panggilan
+# punya satu budget waktu total; antrean, semua percobaan dan jeda backoff
+# harus muat di dalamnya.
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prioritas: angka kecil dilayani lebih dulu
+INTERACTIVE = 0
+BACKGROUND = 1
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# Batas tunggu antrean per prioritas (detik); lewat dari ini -> RateLimitTimeout
+ACQUIRE_TIMEOUTS = {INTERACTIVE: 20.0, BACKGROUND: 120.0}
+
+# Budget total satu panggilan (antrean + semua percobaan + backoff), detik.
+# Batas tunggu di services.py (single-flight, job, deadline) diturunkan dari sini.
+GEMINI_BUDGET = float(os.getenv("GEMINI_BUDGET", "30"))
+TMDB_BUDGET = float(os.getenv("TMDB_BUDGET", "8"))
+BUDGETS = {
+    "gemini": {INTERACTIVE: GEMINI_BUDGET, BACKGROUND: 120.0},
+    "tmdb": {INTERACTIVE: TMDB_BUDGET, BACKGROUND: 30.0},
+}
+# Percobaan tidak dimulai jika sisa budget kurang dari ini
+MIN_ATTEMPT_SECONDS = 1.0
+
+
+class RateLimitTimeout(TimeoutError):
+    """Token tidak tersedia dalam batas waktu antrean"""
+
+
+class Limiter:
+    """
+    Token bucket dengan antrean berprioritas. Pemanggil menunggu sampai
+    gilirannya (prioritas lalu urutan datang) dan ada token tersedia.
+    Respon 429 menahan seluruh bucket sampai jeda backoff/Retry-After lewat,
+    jadi semua session melambat bersama alih-alih terus menabrak limit.
+    """
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = float(rate)  # token per detik
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._metrics = {
+            "acquired": 0, "wait_seconds": 0.0, "max_wait": 0.0,
+            "queue_timeouts": 0, "throttled": 0, "retries": 0, "failures": 0,
+        }
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        timeout = ACQUIRE_TIMEOUTS.get(priority, 60.0) if timeout is None else timeout
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._queue[0] == ticket and now >= self._paused_until and self._tokens >= 1:
+                        heapq.heappop(self._queue)
+                        self._tokens -= 1
+                        waited = now - start
+                        self._metrics["acquired"] += 1
+                        self._metrics["wait_seconds"] += waited
+                        self._metrics["max_wait"] = max(self._metrics["max_wait"], waited)
+                        return waited
+                    remaining = start + timeout - now
+                    if remaining <= 0:
+                        self._queue.remove(ticket)
+                        heapq.heapify(self._queue)
+                        self._metrics["queue_timeouts"] += 1
+                        raise RateLimitTimeout(f"{self.name}: antrean rate limit penuh ({timeout}s)")
+                    next_token = max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.01)
+                    self._cond.wait(min(remaining, next_token))
+            finally:
+                # Giliran pindah ke tiket berikutnya
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._metrics["throttled"] += 1
+
+    def call(self, attempt, priority=INTERACTIVE, classify=None, budget=None):
+        """
+        attempt(timeout) dengan pembatasan laju dan retry, semuanya dalam
+        `budget` detik (None = tanpa batas total). `timeout` = sisa budget saat
+        percobaan dimulai, untuk dipakai sebagai timeout request. Retry berhenti
+        begitu sisa budget tidak cukup untuk jeda berikutnya.
+        `classify(exc)` -> None jika tidak perlu retry, atau (throttled, retry_after)
+        dengan retry_after detik dari server (boleh None).
+        """
+        end = None if budget is None else time.monotonic() + budget
+        for n in range(MAX_RETRIES + 1):
+            queue_timeout = None
+            if end is not None:
+                queue_timeout = end - time.monotonic() - MIN_ATTEMPT_SECONDS
+                if queue_timeout <= 0:
+                    self._fail()
+                    raise RateLimitTimeout(f"{self.name}: budget {budget}s habis")
+                queue_timeout = min(queue_timeout, ACQUIRE_TIMEOUTS.get(priority, 60.0))
+            try:
+                self.acquire(priority, queue_timeout)
+            except RateLimitTimeout:
+                self._fail()
+                raise
+            try:
+                return attempt(None if end is None else end - time.monotonic())
+            except Exception as e:
+                verdict = classify(e) if classify else None
+                delay = None
+                if verdict is not None:
+                    throttled, retry_after = verdict
+                    delay = retry_after if retry_after is not None else backoff_delay(n)
+                    if throttled:
+                        self.pause(delay)
+                out_of_budget = delay is not None and end is not None and \
+                    time.monotonic() + delay + MIN_ATTEMPT_SECONDS > end
+                if delay is None or n == MAX_RETRIES or out_of_budget:
+                    self._fail()
+                    raise
+                with self._cond:
+                    self._metrics["retries"] += 1
+                logger.info("%s retry %d/%d dalam %.2fs (%s)", self.name, n + 1, MAX_RETRIES, delay, e)
+                time.sleep(delay)
+
+    def _fail(self):
+        with self._cond:
+            self._metrics["failures"] += 1
+
+    def metrics(self):
+        with self._cond:
+            data = dict(self._metrics)
+            data["queued"] = len(self._queue)
+            data["tokens"] = round(self._tokens, 2)
+            data["rate"] = self.rate
+            return data
+
+
+def backoff_delay(attempt):
+    """Full jitter: acak 0..min(cap, base * 2^attempt)"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """Header Retry-After (detik atau tanggal HTTP) -> detik, None jika tidak valid"""
+    if not value:
+        return None
+    try:
+        return min(BACKOFF_CAP * 4, max(0.0, float(value)))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return min(BACKOFF_CAP * 4, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+    except Exception:
+        return None
+
+
+def classify_http_error(e):
+    """Error requests (TMDB): 429/5xx/koneksi putus layak diulang"""
+    import requests
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return False, None
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    if response.status_code == 429:
+        return True, parse_retry_after(response.headers.get("Retry-After"))
+    if response.status_code >= 500:
+        return False, None
+    return None
+
+
+def classify_gemini_error(e):
+    """Error google.api_core (Gemini): 429 quota & 500/503 layak diulang"""
+    code = getattr(e, "code", None)
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return None
+    if code == 429:
+        return True, None
+    if code in (500, 503):
+        return False, None
+    return None
+
+
+limiters = {
+    # Default aman untuk tier berbayar Gemini Flash; turunkan via env untuk free tier
+    "gemini": Limiter("gemini", rate=float(os.getenv("GEMINI_RPM", "120")) / 60, burst=int(os.getenv("GEMINI_BURST", "10"))),
+    # TMDB mengizinkan sekitar 40-50 request/detik per IP
+    "tmdb": Limiter("tmdb", rate=float(os.getenv("TMDB_RPS", "35")), burst=int(os.getenv("TMDB_BURST", "20"))),
+}
+
+
+def gemini_call(fn, *args, priority=INTERACTIVE, budget=None, **kwargs):
+    """fn(*args, **kwargs, request_options={"timeout": sisa budget}) lewat limiter Gemini"""
+    budget = BUDGETS["gemini"][priority] if budget is None else budget
+    return limiters["gemini"].call(
+        lambda timeout: fn(*args, request_options={"timeout": timeout}, **kwargs),
+        priority=priority, classify=classify_gemini_error, budget=budget,
+    )
+
+
+def tmdb_call(fn, *args, priority=INTERACTIVE, budget=None):
+    """fn(*args, timeout=sisa budget) lewat limiter TMDB"""
+    budget = BUDGETS["tmdb"][priority] if budget is None else budget
+    return limiters["tmdb"].call(
+        lambda timeout: fn(*args, timeout=timeout),
+        priority=priority, classify=classify_http_error, budget=budget,
+    )
+
+
+def metrics():
+    return {name: limiter.metrics() for name, limiter in limiters.items()}
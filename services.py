@@ -1,25 +1,147 @@
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import requests
+import copy
 import json
+import logging
 import random
 import os
 import streamlit as st
 import re
+import threading
+import time
+import cache
+import mood_classifier
+import posters
+import ranking
+import ratelimit
+import singleflight
+import title_index
+import tracing
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
 
 # Kita coba model pro standar dulu yang biasanya lebih stabil
 GEMINI_MODEL_NAME = 'gemini-flash-latest'
 
+# Semua batas waktu di bawah diturunkan dari budget per panggilan di
+# ratelimit.py (antrean rate limit + retry + request), jadi penunggu
+# single-flight, job dan deadline tidak menyerah selagi pemimpinnya masih
+# dalam budget.
+
+# Single-flight: session serentak dengan mood/summary/judul yang sama berbagi
+# satu panggilan upstream; penunggu menunggu sedikit lebih lama dari budget.
+GEMINI_FLIGHT_TIMEOUT = ratelimit.GEMINI_BUDGET + 2
+TMDB_FLIGHT_TIMEOUT = ratelimit.TMDB_BUDGET + 2  # satu judul = satu request TMDB
+
+# Deadline satu lookup TMDB, dihitung sejak lookup mulai berjalan di pool
+TMDB_DEADLINE = TMDB_FLIGHT_TIMEOUT
+# Waktu antre di pool bersama yang masih ditunggu di atas TMDB_DEADLINE
+TMDB_QUEUE_GRACE = 3
+LOOKUP_POLL_INTERVAL = 0.05
+
+# Pool bersama untuk lookup TMDB paralel (dipakai lintas session). Laju
+# request tetap diatur ratelimit, jadi pool dibuat cukup besar untuk
+# beberapa watchlist serentak.
+TMDB_WORKERS = int(os.getenv("TMDB_WORKERS", "32"))
+_tmdb_pool = ThreadPoolExecutor(max_workers=TMDB_WORKERS, thread_name_prefix="tmdb")
+
+_mood_flights = singleflight.Group()
+_fused_flights = singleflight.Group()
+_recs_flights = singleflight.Group()
+_tmdb_flights = singleflight.Group()
+
+# Ranking kandidat (opsional): pool discover yang lebih luas dinilai dengan NumPy
+RANKING_MODE = os.getenv("MOODCINE_RANKING_MODE", "false").lower() in ("1", "true", "yes")
+CANDIDATE_POOL_SIZE = 200
+RANKED_TOP_K = 8
+
+# Batas waktu job watchlist background: rekomendasi Gemini, lookup TMDB,
+# lalu pool discover untuk ranking (jika aktif)
+WATCHLIST_TIMEOUT = GEMINI_FLIGHT_TIMEOUT + (TMDB_DEADLINE + TMDB_QUEUE_GRACE) * (2 if RANKING_MODE else 1) + 2
+
+# Cache hasil Gemini per proses, key = teks user yang sudah dinormalisasi.
+# Hanya hasil sukses yang disimpan (fallback error tidak pernah masuk cache).
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(6 * 3600)))
+_mood_cache = cache.MemoryCache(max_entries=512, ttl=LLM_CACHE_TTL)
+_recs_cache = cache.MemoryCache(max_entries=512, ttl=LLM_CACHE_TTL)
+# Kalimat "AI Director's Cut" per (movie id, mood)
+_script_cache = cache.MemoryCache(max_entries=2048, ttl=LLM_CACHE_TTL)
+
+SCRIPT_FALLBACK = "Film ini menunggumu."
+
+# Mode fused: analisis mood + rekomendasi film dalam SATU panggilan Gemini.
+# Opsional, aktifkan dengan env MOODCINE_FUSED_MODE=true
+FUSED_MODE = os.getenv("MOODCINE_FUSED_MODE", "false").lower() in ("1", "true", "yes")
+
+# Batas waktu total job analisis di halaman loading. Mode fused yang gagal
+# jatuh ke analyze_mood biasa, jadi bisa dua panggilan berurutan.
+ANALYSIS_TIMEOUT = GEMINI_FLIGHT_TIMEOUT * (2 if FUSED_MODE else 1) + 3
+
+# Batas output analyze_moods_batch per teks (analisis + 4 film ~250 token).
+# Jawaban yang terpotong gagal di-parse dan pack-nya dibelah oleh batch.py.
+BATCH_TOKENS_PER_TEXT = 400
+
+# Fast-path classifier lokal untuk input pendek; Gemini hanya dipakai jika tidak yakin
+LOCAL_CLASSIFIER = os.getenv("MOODCINE_LOCAL_CLASSIFIER", "true").lower() in ("1", "true", "yes")
+
+# KONFIGURASI SAFETY SETTINGS (PENTING!)
+# Kita matikan filter agar mood sedih/marah tidak dianggap berbahaya
+SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+}
+
+# Preset model yang disiapkan sekali (mis. safety settings)
+MODEL_PRESETS = {
+    "analysis": {"safety_settings": SAFETY_SETTINGS},
+    "recommendation": {},
+    "creative": {},
+    "creative_batch": {},
+}
+
+# Registry per proses: API key dibaca & genai.configure dipanggil sekali,
+# GenerativeModel dibuat sekali per (key, model, preset) lalu dipakai bersama
+_api_keys = None
+_configured_key = None
+_models = {}
+_registry_lock = threading.Lock()
+
 def configure_apis():
-    """Mengambil API key dari env atau secrets"""
+    """Mengambil API key dari env atau secrets (sekali per proses)"""
+    global _api_keys, _configured_key
+    if _api_keys is not None:
+        return _api_keys
+
     gemini_key = os.getenv("GEMINI_API_KEY") or st.secrets.get("GEMINI_API_KEY")
     tmdb_key = os.getenv("TMDB_API_KEY") or st.secrets.get("TMDB_API_KEY")
     
-    if gemini_key:
-        genai.configure(api_key=gemini_key)
+    with _registry_lock:
+        if gemini_key and gemini_key != _configured_key:
+            genai.configure(api_key=gemini_key)
+            _configured_key = gemini_key
+        # Hanya disimpan jika lengkap, supaya key yang baru diisi tetap terbaca
+        if gemini_key and tmdb_key:
+            _api_keys = (gemini_key, tmdb_key)
     
     return gemini_key, tmdb_key
 
+def get_model(preset="recommendation", model_name=GEMINI_MODEL_NAME):
+    """GenerativeModel bersama untuk preset tertentu (dibuat sekali per key + model)"""
+    if _configured_key is None:
+        configure_apis()
+    key = (_configured_key, model_name, preset)
+    model = _models.get(key)
+    if model is None:
+        with _registry_lock:
+            model = _models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name, **MODEL_PRESETS[preset])
+                _models[key] = model
+    return model
+
 def _clean_json_string(text_response):
     """Membersihkan format markdown ```json dari respon Gemini"""
     try:
@@ -31,118 +153,722 @@ def _clean_json_string(text_response):
     except:
         return text_response
 
-def analyze_mood(text):
+def _report(on_stage, stage):
+    if on_stage is not None:
+        on_stage(stage)
+
+def _generate(model, prompt, priority=ratelimit.INTERACTIVE, **kwargs):
+    """
+    model.generate_content lewat rate limiter Gemini (429/503 diulang dengan
+    backoff), selesai dalam budget ratelimit.BUDGETS untuk prioritasnya
+    """
+    return ratelimit.gemini_call(model.generate_content, prompt, priority=priority, **kwargs)
+
+@tracing.traced(upstream="gemini")
+def analyze_mood(text, on_stage=None):
     """
     Analisis mood yang mengembalikan JSON terstruktur.
+    `on_stage` (opsional) menerima nama tahap: classifying, calling_gemini, parsing.
     """
-    try:
-        # 1. KONFIGURASI MODEL & SAFETY SETTINGS (PENTING!)
-        # Kita matikan filter agar mood sedih/marah tidak dianggap berbahaya
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
+    cache_key = cache.normalize_text(text)
+    cached = _mood_cache.get(cache_key)
+    if cached is not None:
+        tracing.tag(cache="hit", source=cached.get('source'))
+        return copy.deepcopy(cached)
 
-        prompt = f"""
-        Act as an emotional analysis AI. Analyze this user text: "{text}".
-        
-        You MUST return a raw JSON object (no markdown, no code blocks) with this structure:
-        {{
-            "detected_moods": ["mood1", "mood2"],
-            "intensity_score": 85,
-            "thematic_keywords": ["#keyword1", "#keyword2", "#keyword3"],
-            "genre_alignment": [
-                {{"genre": "Drama", "score": 90}},
-                {{"genre": "Comedy", "score": 40}},
-                {{"genre": "Thriller", "score": 60}},
-                {{"genre": "Romance", "score": 20}}
-            ],
-            "summary_text": "Brief summary of the mood."
-        }}
-        Rules:
-        1. intensity_score must be integer 0-100.
-        2. genre score must be integer 0-100.
-        3. Do not include explanation, just the JSON.
-        """
-        
-        # Request tanpa 'response_mime_type' dulu agar kompatibel semua versi
-        response = model.generate_content(prompt, safety_settings=safety_settings)
-        
-        # Cek apakah response diblokir safety filter
-        if not response.text:
-            st.error("⚠️ Error: Gemini memblokir respon ini (Safety Filter Triggered).")
-            raise ValueError("Empty response from Gemini")
+    _report(on_stage, "classifying")
+    local = _classify_locally(text)
+    if local is not None:
+        tracing.tag(cache="local", source="local")
+        return local
 
-        # Bersihkan dan Parse
-        clean_text = _clean_json_string(response.text)
-        return json.loads(clean_text)
+    _report(on_stage, "calling_gemini")
+    tracing.tag(cache="miss")
+    try:
+        data = _mood_flights.do(cache_key, _analyze_mood_gemini, text, cache_key, on_stage, timeout=GEMINI_FLIGHT_TIMEOUT)
+        tracing.tag(source="gemini")
+        return copy.deepcopy(data)
 
     except Exception as e:
-        # --- DEBUGGING DISPLAY ---
-        # Ini akan memunculkan kotak merah di layar berisi alasan errornya
-        st.error(f"🚨 DEBUG ERROR DETAILS: {str(e)}")
+        # Berjalan di thread job (tanpa ScriptRunContext, st.error tidak tampil):
+        # pesan error dibawa di hasil fallback dan ditampilkan oleh main.py
+        tracing.tag(outcome="fallback", error=type(e).__name__, source="error")
         
         # Return fallback agar aplikasi tidak crash total
-        return {
-            "detected_moods": ["Error"],
-            "intensity_score": 0,
-            "thematic_keywords": ["#TryAgain"],
-            "genre_alignment": [{"genre": "Error", "score": 0}],
-            "summary_text": "System Error. Check the red box above."
-        }
+        return _error_fallback(f"DEBUG ERROR DETAILS: {e}")
 
-def get_recommendations(mood_summary):
+def _analyze_mood_gemini(text, cache_key, on_stage=None):
+    """Panggilan Gemini untuk analyze_mood (raise jika gagal, hasil dibagi lewat single-flight)"""
+    # 1. MODEL BERSAMA (safety settings sudah terpasang di preset "analysis")
+    model = get_model("analysis")
+
+    prompt = f"""
+    Act as an emotional analysis AI. Analyze this user text: "{text}".
+    
+    You MUST return a raw JSON object (no markdown, no code blocks) with this structure:
+    {{
+        "detected_moods": ["mood1", "mood2"],
+        "intensity_score": 85,
+        "thematic_keywords": ["#keyword1", "#keyword2", "#keyword3"],
+        "genre_alignment": [
+            {{"genre": "Drama", "score": 90}},
+            {{"genre": "Comedy", "score": 40}},
+            {{"genre": "Thriller", "score": 60}},
+            {{"genre": "Romance", "score": 20}}
+        ],
+        "summary_text": "Brief summary of the mood."
+    }}
+    Rules:
+    1. intensity_score must be integer 0-100.
+    2. genre score must be integer 0-100.
+    3. Do not include explanation, just the JSON.
+    """
+    
+    # Request tanpa 'response_mime_type' dulu agar kompatibel semua versi
+    response = _generate(model, prompt)
+    
+    # Cek apakah response diblokir safety filter
+    if not response.text:
+        raise ValueError("Gemini memblokir respon ini (Safety Filter Triggered).")
+
+    # Bersihkan dan Parse
+    _report(on_stage, "parsing")
+    clean_text = _clean_json_string(response.text)
+    data = json.loads(clean_text)
+    data['source'] = "gemini"
+    _mood_cache.set(cache_key, data)
+    return data
+
+def _classify_locally(text):
+    """Jalur cepat lokal (beberapa ms); None berarti harus lewat Gemini"""
+    if not LOCAL_CLASSIFIER:
+        return None
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        prompt = f"""
+        data = mood_classifier.classify(text)
+    except Exception as e:
+        logger.warning("classifier lokal gagal: %s", e)
+        return None
+    if data is not None:
+        tracing.tag(confidence=data['confidence'])
+    return data
+
+def _error_fallback(error="Analisis mood gagal."):
+    """Hasil pengganti; `error` ditampilkan UI (main.py) di thread script"""
+    return {
+        "detected_moods": ["Error"],
+        "intensity_score": 0,
+        "thematic_keywords": ["#TryAgain"],
+        "genre_alignment": [{"genre": "Error", "score": 0}],
+        "summary_text": "System Error. Please try again.",
+        "source": "error",
+        "error": error,
+    }
+
+def _recommendation_prompt(mood_summary):
+    return f"""
         Mood: '{mood_summary}'.
         Recommend 4 movies.
         Output raw JSON list: [{{ "title": "Movie Title", "reason": "Short reason" }}]
         """
-        response = model.generate_content(prompt)
-        clean_text = _clean_json_string(response.text)
-        return json.loads(clean_text)
+
+def _iter_json_array_objects(chunks):
+    """
+    Parser JSON array inkremental: yield setiap objek {...} begitu kurung
+    tutupnya diterima, tanpa menunggu array (atau code block) selesai.
+    """
+    buf = []
+    depth = 0
+    in_string = False
+    escaped = False
+    for chunk in chunks:
+        for ch in chunk:
+            if depth == 0:
+                # Di luar objek: abaikan '[', ',', spasi, dan pagar ```json
+                if ch == '{':
+                    depth = 1
+                    buf = [ch]
+                continue
+            buf.append(ch)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(''.join(buf))
+                    except ValueError:
+                        pass
+
+@tracing.traced(upstream="gemini")
+def stream_recommendations(mood_summary):
+    """
+    Versi streaming get_recommendations: yield {title, reason} satu per satu.
+    Session lain yang meminta summary yang sama selagi stream berjalan
+    menunggu daftar lengkap dari stream pemimpin (single-flight).
+    """
+    cache_key = cache.normalize_text(mood_summary)
+    cached = _recs_cache.get(cache_key)
+    if cached is not None:
+        tracing.tag(cache="hit")
+        yield from copy.deepcopy(cached)
+        return
+
+    call, leader = _recs_flights.begin(cache_key)
+    if not leader:
+        tracing.tag(cache="coalesced")
+        try:
+            yield from copy.deepcopy(_recs_flights.wait(call, GEMINI_FLIGHT_TIMEOUT))
+        except Exception as e:
+            tracing.tag(outcome="fallback", error=type(e).__name__)
+            logger.warning("menunggu stream rekomendasi gagal: %r", e)
+        return
+
+    tracing.tag(cache="miss")
+    recs = []
+    error = None
+    try:
+        model = get_model("recommendation")
+        response = _generate(model, _recommendation_prompt(mood_summary), stream=True)
+        for rec in _iter_json_array_objects(chunk.text for chunk in response):
+            if rec.get('title'):
+                recs.append(rec)
+                yield rec
+    except GeneratorExit:
+        # Konsumen berhenti di tengah jalan: daftar belum lengkap, jangan dibagi
+        error = RuntimeError("stream rekomendasi dihentikan")
+        raise
     except Exception as e:
+        error = e
+        tracing.tag(outcome="fallback", error=type(e).__name__)
+        logger.warning("streaming rekomendasi gagal: %s", e)
+        return
+    finally:
+        if error is None and recs:
+            _recs_cache.set(cache_key, copy.deepcopy(recs))
+        _recs_flights.finish(cache_key, call, result=recs, error=error)
+
+@tracing.traced(upstream="gemini")
+def get_recommendations(mood_summary):
+    cache_key = cache.normalize_text(mood_summary)
+    cached = _recs_cache.get(cache_key)
+    if cached is not None:
+        tracing.tag(cache="hit")
+        return copy.deepcopy(cached)
+
+    tracing.tag(cache="miss")
+    try:
+        recs = _recs_flights.do(cache_key, _fetch_recommendations, mood_summary, cache_key, timeout=GEMINI_FLIGHT_TIMEOUT)
+        return copy.deepcopy(recs)
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
         st.warning(f"Gagal mengambil rekomendasi: {e}")
         return []
 
+def _fetch_recommendations(mood_summary, cache_key):
+    model = get_model("recommendation")
+    response = _generate(model, _recommendation_prompt(mood_summary))
+    clean_text = _clean_json_string(response.text)
+    recs = json.loads(clean_text)
+    if recs:
+        _recs_cache.set(cache_key, recs)
+    return recs
+
+@tracing.traced(upstream="gemini")
+def analyze_mood_with_recommendations(text, on_stage=None):
+    """
+    Mode fused: analisis mood dan daftar film dari satu panggilan Gemini.
+    Return (analysis, recs). Jika gagal, jatuh ke analyze_mood biasa dan
+    recs = None (rekomendasi nanti diambil lewat get_recommendations).
+    """
+    cache_key = cache.normalize_text(text)
+    cached = _mood_cache.get(cache_key)
+    if cached is not None:
+        recs = _recs_cache.get(cache.normalize_text(cached.get('summary_text', '')))
+        if recs is not None:
+            tracing.tag(cache="hit", source=cached.get('source'))
+            return copy.deepcopy(cached), copy.deepcopy(recs)
+
+    # Input pendek yang jelas: analisis lokal, rekomendasi nanti lewat get_recommendations
+    _report(on_stage, "classifying")
+    local = _classify_locally(text)
+    if local is not None:
+        tracing.tag(cache="local", source="local")
+        return local, None
+
+    _report(on_stage, "calling_gemini")
+    tracing.tag(cache="miss")
+    try:
+        data, recs = _fused_flights.do(cache_key, _analyze_fused_gemini, text, cache_key, on_stage, timeout=GEMINI_FLIGHT_TIMEOUT)
+        tracing.tag(source="gemini")
+        return copy.deepcopy(data), copy.deepcopy(recs)
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
+        logger.warning("fused mode gagal, kembali ke dua panggilan: %s", e)
+        return analyze_mood(text, on_stage), None
+
+def _analyze_fused_gemini(text, cache_key, on_stage=None):
+    """Panggilan Gemini mode fused (raise jika gagal), return (data, recs)"""
+    model = get_model("analysis")
+    prompt = f"""
+    Act as an emotional analysis AI and movie curator. Analyze this user text: "{text}".
+
+    You MUST return a raw JSON object (no markdown, no code blocks) with this structure:
+    {{
+        "detected_moods": ["mood1", "mood2"],
+        "intensity_score": 85,
+        "thematic_keywords": ["#keyword1", "#keyword2", "#keyword3"],
+        "genre_alignment": [
+            {{"genre": "Drama", "score": 90}},
+            {{"genre": "Comedy", "score": 40}},
+            {{"genre": "Thriller", "score": 60}},
+            {{"genre": "Romance", "score": 20}}
+        ],
+        "summary_text": "Brief summary of the mood.",
+        "recommendations": [{{ "title": "Movie Title", "reason": "Short reason" }}]
+    }}
+    Rules:
+    1. intensity_score must be integer 0-100.
+    2. genre score must be integer 0-100.
+    3. recommendations must contain exactly 4 movies that fit the summary_text.
+    4. Do not include explanation, just the JSON.
+    """
+    response = _generate(model, prompt)
+    if not response.text:
+        raise ValueError("Empty response from Gemini")
+
+    _report(on_stage, "parsing")
+    data = json.loads(_clean_json_string(response.text))
+    recs = data.pop('recommendations', None)
+    if not isinstance(recs, list) or not recs:
+        raise ValueError("Fused response has no recommendations")
+    data['source'] = "gemini"
+
+    # Simpan ke dua cache: get_recommendations(summary_text) nanti langsung hit
+    _mood_cache.set(cache_key, data)
+    _recs_cache.set(cache.normalize_text(data.get('summary_text', '')), recs)
+    return data, recs
+
+@tracing.traced(upstream="gemini")
+def analyze_moods_batch(texts):
+    """
+    Mode batch (batch.py): analisis + rekomendasi beberapa teks dalam SATU
+    panggilan Gemini. Return list (analysis, recs) sejajar dengan `texts`;
+    entri None berarti teks itu tidak ada/invalid di jawaban. Raise jika
+    panggilan gagal atau jawabannya bukan JSON (ValueError).
+    """
+    results = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        cached = _mood_cache.get(cache.normalize_text(text))
+        if cached is not None:
+            recs = _recs_cache.get(cache.normalize_text(cached.get('summary_text', '')))
+            if recs is not None:
+                results[i] = (copy.deepcopy(cached), copy.deepcopy(recs))
+                continue
+        pending.append(i)
+    tracing.tag(cache="hit" if not pending else "miss")
+    if not pending:
+        return results
+
+    model = get_model("analysis")
+    items = "\n".join(f"- id {n}: {json.dumps(texts[i], ensure_ascii=False)}" for n, i in enumerate(pending))
+    prompt = f"""
+    Act as an emotional analysis AI and movie curator. Analyze EACH user text below independently.
+    {items}
+
+    You MUST return a raw JSON list (no markdown, no code blocks), one object per text:
+    [{{
+        "id": 0,
+        "detected_moods": ["mood1", "mood2"],
+        "intensity_score": 85,
+        "thematic_keywords": ["#keyword1", "#keyword2", "#keyword3"],
+        "genre_alignment": [
+            {{"genre": "Drama", "score": 90}},
+            {{"genre": "Comedy", "score": 40}},
+            {{"genre": "Thriller", "score": 60}},
+            {{"genre": "Romance", "score": 20}}
+        ],
+        "summary_text": "Brief summary of the mood.",
+        "recommendations": [{{ "title": "Movie Title", "reason": "Short reason" }}]
+    }}]
+    Rules:
+    1. "id" must match the id of the text.
+    2. intensity_score and genre score must be integers 0-100.
+    3. recommendations must contain exactly 4 movies that fit the summary_text.
+    4. Do not include explanation, just the JSON.
+    """
+    response = _generate(
+        model, prompt, priority=ratelimit.BACKGROUND,
+        generation_config={"max_output_tokens": BATCH_TOKENS_PER_TEXT * len(pending)},
+    )
+    data = json.loads(_clean_json_string(response.text))
+
+    by_id = {str(d.get('id')): d for d in data if isinstance(d, dict)} if isinstance(data, list) else {}
+    for n, i in enumerate(pending):
+        d = by_id.get(str(n))
+        if not d:
+            continue
+        d = dict(d)
+        d.pop('id', None)
+        recs = d.pop('recommendations', None)
+        if not isinstance(recs, list) or not recs or not d.get('summary_text'):
+            continue
+        d['source'] = "gemini"
+        _mood_cache.set(cache.normalize_text(texts[i]), d)
+        _recs_cache.set(cache.normalize_text(d['summary_text']), recs)
+        results[i] = (copy.deepcopy(d), copy.deepcopy(recs))
+    return results
+
+@tracing.traced()
+def run_analysis(text, on_stage=None, cancel_event=None):
+    """
+    Job halaman loading: analisis mood (fused jika FUSED_MODE aktif).
+    Return (analysis, candidates); candidates None di mode biasa.
+    """
+    if FUSED_MODE:
+        return analyze_mood_with_recommendations(text, on_stage)
+    return analyze_mood(text, on_stage), None
+
+def analysis_fallback_result(error):
+    """Hasil pengganti jika job analisis gagal atau melewati ANALYSIS_TIMEOUT"""
+    return _error_fallback(error), None
+
 def _calculate_match_score(movie_data):
     vote_avg = movie_data.get('vote_average', 0)
     vote_count = movie_data.get('vote_count', 0)
     base_score = vote_avg * 10
     return min(99, int(base_score * (1 - 1 / (vote_count + 1)) + 10))
 
+def _resolve_title(movie_title, api_key):
+    """
+    Judul -> record film TMDB. Index lokal dulu (tanpa network), live search
+    hanya untuk judul yang belum dikenal. Hasil live ikut masuk ke index.
+    """
+    title, year = title_index.split_year(movie_title)
+    index = title_index.get_index()
+
+    found = index.lookup(title, year)
+    if found is not None:
+        m, complete = found
+        if complete:
+            return m
+        # Record dari export harian (tanpa poster/rating): lengkapi via detail film
+        m = cache.tmdb_get(f"/movie/{m['id']}", {"language": "id-ID"}, api_key)
+        m['genre_ids'] = [g['id'] for g in m.get('genres', [])]
+        index.add_movies([m])
+        return m
+
+    params = {"query": title, "language": "id-ID"}
+    if year:
+        params["year"] = year
+    data = cache.tmdb_get("/search/movie", params, api_key)
+    results = data.get('results') or []
+    index.add_movies(results)
+    return title_index.best_match(title, results, year)
+
+@tracing.traced(upstream="tmdb")
 def search_tmdb_details(movie_title, api_key):
     if not api_key: return None
     try:
-        url = "https://api.themoviedb.org/3/search/movie"
-        params = {"api_key": api_key, "query": movie_title, "language": "id-ID"}
-        data = requests.get(url, params=params).json()
-        
-        if data.get('results'):
-            m = data['results'][0]
-            match_score = _calculate_match_score(m)
-            return {
-                "id": m['id'],
-                "title": m['title'],
-                "overview": m.get('overview') or "Sinopsis belum tersedia.",
-                "year": m.get('release_date', '')[:4],
-                "rating": round(m['vote_average'], 1),
-                "poster": f"https://image.tmdb.org/t/p/w500{m['poster_path']}" if m['poster_path'] else "https://via.placeholder.com/500x750",
-                "match": match_score
-            }
-        return None
-    except:
+        details = _tmdb_flights.do(
+            cache.normalize_text(movie_title), _search_tmdb_details,
+            movie_title, api_key, timeout=TMDB_FLIGHT_TIMEOUT,
+        )
+        return copy.deepcopy(details)
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
         return None
 
-def generate_creative_script(movie_title, mood):
+def _search_tmdb_details(movie_title, api_key):
+    m = _resolve_title(movie_title, api_key)
+    if m:
+        return _to_details(m)
+    return None
+
+def _to_details(m):
+    """Record TMDB -> format kartu yang dipakai UI"""
+    return {
+        "id": m['id'],
+        "title": m['title'],
+        "overview": m.get('overview') or "Sinopsis belum tersedia.",
+        "year": (m.get('release_date') or '')[:4],
+        "rating": round(m.get('vote_average') or 0, 1),
+        "poster": posters.poster_url(m['poster_path'], "modal") if m.get('poster_path') else None,
+        "poster_path": m.get('poster_path'),
+        "match": _calculate_match_score(m),
+        # Dipakai ranking.py
+        "genre_ids": m.get('genre_ids') or [g['id'] for g in m.get('genres', [])],
+        "vote_count": m.get('vote_count', 0),
+        "popularity": m.get('popularity', 0),
+    }
+
+class _Lookup:
+    """Panggilan di _tmdb_pool yang mencatat kapan mulai berjalan (bukan kapan di-submit)"""
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+        self.started_at = None
+        self.future = tracing.submit(_tmdb_pool, self._run)
+
+    def _run(self):
+        self.started_at = time.monotonic()
+        return self.fn(*self.args)
+
+    def overdue(self, deadline, now):
+        return self.started_at is not None and now - self.started_at > deadline
+
+    def result(self):
+        """Hasil lookup yang selesai, None jika gagal/dibatalkan/belum selesai"""
+        if not self.future.done() or self.future.cancelled() or self.future.exception() is not None:
+            return None
+        return self.future.result()
+
+def _finished_lookups(lookups, deadline, cancel_event=None):
+    """
+    Yield lookup begitu selesai. Deadline berlaku per lookup sejak mulai
+    berjalan, jadi lookup yang hanya antre di pool bersama tidak langsung
+    dibuang; total tunggu dibatasi deadline + TMDB_QUEUE_GRACE. Lookup yang
+    tersisa dibatalkan (yang belum jalan tidak akan pernah jalan).
+    """
+    pending = set(lookups)
+    hard_end = time.monotonic() + deadline + TMDB_QUEUE_GRACE
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        prompt = f"Buat satu kalimat puitis pendek (max 20 kata) tentang film '{movie_title}' untuk mood '{mood}'. Bahasa Indonesia."
-        return model.generate_content(prompt).text
-    except:
-        return "Film ini menunggumu."
\ No newline at end of file
+        while pending and not (cancel_event is not None and cancel_event.is_set()):
+            now = time.monotonic()
+            live = [l for l in pending if not l.overdue(deadline, now)]
+            if not live or now >= hard_end:
+                break
+            ends = [l.started_at + deadline for l in live if l.started_at is not None]
+            if len(ends) < len(live):
+                # Lookup yang masih antre bisa mulai kapan saja: cek ulang deadline-nya sebentar lagi
+                ends.append(now + LOOKUP_POLL_INTERVAL)
+            timeout = max(0.0, min(ends + [hard_end]) - now)
+            wait([l.future for l in live], timeout=timeout, return_when=FIRST_COMPLETED)
+            for l in [l for l in pending if l.future.done()]:
+                pending.discard(l)
+                yield l
+    finally:
+        for l in pending:
+            l.future.cancel()
+
+@tracing.traced(upstream="tmdb")
+def fetch_candidate_pool(analysis, api_key, pool_size=CANDIDATE_POOL_SIZE):
+    """
+    Kumpulan kandidat luas dari /discover/movie untuk genre teratas hasil
+    analisis (halaman-halaman diambil paralel, lewat cache TMDB).
+    """
+    genres = sorted(analysis.get('genre_alignment', []), key=lambda g: g.get('score', 0), reverse=True)
+    genre_ids = [gid for gid in (ranking.genre_id(g.get('genre')) for g in genres[:3]) if gid]
+    if not genre_ids:
+        return []
+
+    pages = max(1, pool_size // (20 * len(genre_ids)))  # 20 film per halaman TMDB
+    lookups = [
+        _Lookup(
+            cache.tmdb_get, "/discover/movie",
+            {"with_genres": gid, "sort_by": "popularity.desc", "vote_count.gte": 100,
+             "language": "id-ID", "page": page},
+            api_key,
+        )
+        for gid in genre_ids for page in range(1, pages + 1)
+    ]
+
+    pool = {}
+    for lookup in _finished_lookups(lookups, TMDB_DEADLINE):
+        data = lookup.result()
+        if data:
+            for m in data.get('results', []):
+                pool.setdefault(m['id'], m)
+    return [_to_details(m) for m in pool.values()]
+
+@tracing.traced()
+def rank_watchlist(analysis, llm_details, api_key, top_k=RANKED_TOP_K):
+    """
+    Gabungkan pilihan Gemini dengan pool discover, lalu ranking sekaligus
+    berdasarkan genre_alignment. Skor menggantikan 'match' dan rinciannya
+    disimpan di 'score_breakdown'.
+    """
+    candidates = {d['id']: d for d in fetch_candidate_pool(analysis, api_key)}
+    # Pilihan Gemini menang atas duplikat dari pool (punya 'reason')
+    candidates.update({d['id']: d for d in llm_details})
+
+    ranked = []
+    for details, score, breakdown in ranking.rank_candidates(list(candidates.values()), analysis.get('genre_alignment'), top_k):
+        details = dict(details)
+        details['match'] = min(99, int(score * 100))
+        details['score_breakdown'] = breakdown
+        if not details.get('reason'):
+            details['reason'] = f"Cocok dengan mood kamu (genre fit {int(breakdown['genre'] * 100)}%)."
+        ranked.append(details)
+    return ranked
+
+@tracing.traced(upstream="tmdb")
+def enrich_recommendations(recs, api_key, deadline=TMDB_DEADLINE):
+    """
+    Cari detail TMDB untuk semua rekomendasi sekaligus (paralel).
+    Urutan hasil mengikuti `recs`. Judul yang gagal atau belum selesai
+    saat deadline habis dilewati, jadi yang kembali bisa sebagian saja.
+    """
+    lookups = [(r, _Lookup(search_tmdb_details, r.get('title', ''), api_key)) for r in recs if r.get('title')]
+    for _ in _finished_lookups([l for _, l in lookups], deadline):
+        pass
+
+    final_data = []
+    seen = set()
+    for r, lookup in lookups:
+        details = lookup.result()
+        # Dua judul rekomendasi bisa jatuh ke film TMDB yang sama
+        if details and details['id'] not in seen:
+            seen.add(details['id'])
+            # Gabungkan reason AI
+            details['reason'] = r.get('reason', '')
+            final_data.append(details)
+    return final_data
+
+def _lookup_with_reason(rec, api_key):
+    details = search_tmdb_details(rec['title'], api_key)
+    if details:
+        # Gabungkan reason AI
+        details['reason'] = rec.get('reason', '')
+        # Poster grid mulai diunduh selagi kartu lain masih dicari
+        posters.prefetch(details['poster_path'])
+    return details
+
+@tracing.traced()
+def iter_watchlist(mood_summary, api_key, candidates=None, cancel_event=None, deadline=TMDB_DEADLINE):
+    """
+    Pipeline streaming: lookup TMDB dimulai begitu satu judul selesai di-stream
+    dari Gemini, dan kartu di-yield sesuai urutan selesai (satu kartu per
+    id TMDB). `candidates` dari mode fused dipakai jika ada (tanpa panggilan
+    Gemini).
+    """
+    recs = candidates if candidates else stream_recommendations(mood_summary)
+    pending = set()
+    seen = set()
+
+    def fresh(done):
+        for lookup in done:
+            details = lookup.result()
+            if details and details['id'] not in seen:
+                seen.add(details['id'])
+                yield details
+
+    for rec in recs:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if not rec.get('title'):
+            continue
+        pending.add(_Lookup(_lookup_with_reason, rec, api_key))
+        # Keluarkan kartu yang sudah siap selagi Gemini masih menulis
+        done = {l for l in pending if l.future.done()}
+        pending -= done
+        yield from fresh(done)
+
+    # Sisa lookup setelah stream selesai, dibatasi deadline per lookup
+    yield from fresh(_finished_lookups(pending, deadline, cancel_event))
+
+@tracing.traced()
+def prepare_watchlist(mood_summary, api_key, candidates=None, partial=None, analysis=None, cancel_event=None):
+    """
+    Pipeline rekomendasi lengkap (Gemini -> TMDB) untuk dijalankan di background.
+    Setiap kartu yang selesai langsung ditambahkan ke list `partial` supaya UI
+    bisa mengisi grid satu per satu. Dengan RANKING_MODE, hasil akhirnya
+    di-ranking ulang bersama pool discover. Berhenti lebih awal jika
+    cancel_event di-set (session reset / ditinggalkan).
+    """
+    results = partial if partial is not None else []
+    for details in iter_watchlist(mood_summary, api_key, candidates, cancel_event):
+        results.append(details)
+    if RANKING_MODE and analysis and not (cancel_event is not None and cancel_event.is_set()):
+        return rank_watchlist(analysis, list(results), api_key)
+    return list(results)
+
+def _script_key(movie_id, mood):
+    return f"{movie_id}|{cache.normalize_text(mood)}"
+
+def _script_prompt(movie_title, mood):
+    return f"Buat satu kalimat puitis pendek (max 20 kata) tentang film '{movie_title}' untuk mood '{mood}'. Bahasa Indonesia."
+
+def get_cached_script(movie_id, mood):
+    """Kalimat Director's Cut yang sudah jadi, atau None"""
+    return _script_cache.get(_script_key(movie_id, mood))
+
+@tracing.traced(upstream="gemini")
+def generate_creative_script(movie_title, mood, movie_id=None):
+    if movie_id is not None:
+        cached = get_cached_script(movie_id, mood)
+        if cached:
+            tracing.tag(cache="hit")
+            return cached
+    tracing.tag(cache="miss")
+    try:
+        model = get_model("creative")
+        script = _generate(model, _script_prompt(movie_title, mood)).text
+        if movie_id is not None and script:
+            _script_cache.set(_script_key(movie_id, mood), script)
+        return script
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
+        return SCRIPT_FALLBACK
+
+@tracing.traced(upstream="gemini")
+def generate_creative_scripts(movies, mood, cancel_event=None):
+    """
+    Kalimat Director's Cut untuk semua kartu dalam SATU panggilan Gemini.
+    Disimpan ke cache per (movie id, mood); film yang sudah ada di cache dilewati.
+    """
+    pending = [m for m in movies if get_cached_script(m['id'], mood) is None]
+    if not pending or (cancel_event is not None and cancel_event.is_set()):
+        tracing.tag(cache="hit")
+        return
+    tracing.tag(cache="miss")
+    try:
+        model = get_model("creative_batch")
+        films = "\n".join(f"- id {m['id']}: {m['title']} ({m.get('year', '')})" for m in pending)
+        prompt = f"""
+        Untuk setiap film di bawah, buat satu kalimat puitis pendek (max 20 kata) untuk mood '{mood}'. Bahasa Indonesia.
+        {films}
+        Output raw JSON object: {{"<id>": "kalimat"}}
+        """
+        scripts = json.loads(_clean_json_string(_generate(model, prompt, priority=ratelimit.BACKGROUND).text))
+        for m in pending:
+            script = scripts.get(str(m['id']))
+            if script:
+                _script_cache.set(_script_key(m['id'], mood), script)
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
+        logger.warning("batch Director's Cut gagal: %s", e)
+
+@tracing.traced(upstream="gemini")
+def stream_creative_script(movie_title, mood, movie_id):
+    """Generator kalimat Director's Cut token demi token (hasil akhirnya ikut di-cache)"""
+    cached = get_cached_script(movie_id, mood)
+    if cached:
+        tracing.tag(cache="hit")
+        yield cached
+        return
+    tracing.tag(cache="miss")
+    script = ""
+    try:
+        model = get_model("creative")
+        for chunk in _generate(model, _script_prompt(movie_title, mood), stream=True):
+            if chunk.text:
+                script += chunk.text
+                yield chunk.text
+    except Exception as e:
+        tracing.tag(outcome="fallback", error=type(e).__name__)
+        if not script:
+            yield SCRIPT_FALLBACK
+        return
+    if script:
+        _script_cache.set(_script_key(movie_id, mood), script)
\ No newline at end of file
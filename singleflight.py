@@ -0,0 +1,79 @@
+# singleflight.py
+# Penggabungan panggilan serentak: banyak session dengan key yang sama
+# (mis. mood yang sama saat traffic melonjak) berbagi satu panggilan ke
+# Gemini/TMDB dan semuanya menerima hasil (atau error) yang sama.
+import threading
+
+
+class FlightTimeout(TimeoutError):
+    """Panggilan pemimpin belum selesai dalam batas waktu penunggu"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """
+    Satu Group per jenis panggilan. Pemanggil pertama untuk sebuah key menjadi
+    pemimpin dan menjalankan fungsi; pemanggil lain selama panggilan masih
+    berjalan hanya menunggu hasilnya. Key dilepas begitu panggilan selesai,
+    jadi hasil tidak disimpan di sini (itu tugas cache).
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """Return (call, leader). Pemimpin wajib memanggil finish()"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def wait(self, call, timeout=None):
+        """Tunggu hasil pemimpin; error pemimpin diteruskan ke semua penunggu"""
+        timeout = self.timeout if timeout is None else timeout
+        if not call.done.wait(timeout):
+            raise FlightTimeout(f"single-flight menunggu lebih dari {timeout}s")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Jalankan fn(*args, **kwargs) sekali untuk semua pemanggil serentak
+        dengan key yang sama. Hasil dibagi bersama: jangan dimutasi.
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call, timeout)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,161 @@
+import json
+import uuid
+
+import pytest
+
+import batch
+import services
+
+
+class Crash(BaseException):
+    """Proses mati di tengah jalan (mis. KeyboardInterrupt)"""
+
+
+def analysis_for(text):
+    return {"summary_text": f"mood {text}", "source": "gemini"}, [{"title": f"Film {text}", "reason": "cocok"}]
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    """analyze_moods_batch palsu; `calls` mencatat isi tiap pack"""
+    state = {"calls": [], "fail_on": None, "crash_on": None, "max_pack": None}
+
+    def analyze_moods_batch(texts):
+        state["calls"].append(list(texts))
+        if state["crash_on"] in texts:
+            raise Crash()
+        if state["fail_on"] in texts:
+            raise RuntimeError("503 upstream")
+        if state["max_pack"] and len(texts) > state["max_pack"]:
+            raise ValueError("jawaban terpotong")
+        return [analysis_for(t) for t in texts]
+
+    monkeypatch.setattr(services, "configure_apis", lambda: (None, "tmdb-key"))
+    monkeypatch.setattr(services, "analyze_moods_batch", analyze_moods_batch)
+    monkeypatch.setattr(services, "search_tmdb_details", lambda title, key: {"id": title, "title": title})
+    return state
+
+
+def write_input(path, texts):
+    with open(path, "w", encoding="utf-8") as f:
+        for n, text in enumerate(texts):
+            f.write(json.dumps({"id": f"r{n}", "text": text}) + "\n")
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_truncates_partial_output(tmp_path, fake_services):
+    src, out = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")
+    write_input(src, [f"teks {n}" for n in range(5)])
+
+    fake_services["crash_on"] = "teks 2"
+    with pytest.raises(Crash):
+        batch.run(src, out, pack=1, concurrency=1, chunk_size=2)
+    ckpt = batch.load_checkpoint(out + batch.CHECKPOINT_SUFFIX)
+    assert ckpt["rows_read"] == ckpt["rows_done"] == 2
+    # Sisa tulisan chunk yang belum sempat di-checkpoint
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"id": "r2", "te')
+
+    fake_services["crash_on"] = None
+    fake_services["calls"].clear()
+    batch.run(src, out, pack=1, concurrency=1, chunk_size=2)
+    rows = read_output(out)
+    assert [r["id"] for r in rows] == ["r0", "r1", "r2", "r3", "r4"]
+    assert all(r["movies"] for r in rows)
+    # Baris yang sudah di-checkpoint tidak dianalisis ulang
+    assert ["teks 0"] not in fake_services["calls"]
+    assert batch.load_checkpoint(out + batch.CHECKPOINT_SUFFIX)["rows_done"] == 5
+
+
+def test_restart_ignores_checkpoint(tmp_path, fake_services):
+    src, out = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")
+    write_input(src, ["a", "b"])
+    batch.run(src, out, chunk_size=1)
+    batch.run(src, out, chunk_size=1, restart=True)
+    assert [r["id"] for r in read_output(out)] == ["r0", "r1"]
+
+
+def test_failed_pack_writes_error_rows_and_is_not_done(tmp_path, fake_services):
+    src, out = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl")
+    write_input(src, ["a", "b", "c", "d"])
+    fake_services["fail_on"] = "a"
+    stats = batch.run(src, out, pack=2, concurrency=1, chunk_size=10)
+    rows = read_output(out)
+    assert [("error" in r, "analysis" in r) for r in rows] == [(True, False), (True, False), (False, True), (False, True)]
+    # Pack yang gagal tidak dipecah jadi panggilan per teks
+    assert fake_services["calls"] == [["a", "b"], ["c", "d"]]
+    assert stats["failed"] == 2
+    ckpt = batch.load_checkpoint(out + batch.CHECKPOINT_SUFFIX)
+    assert (ckpt["rows_read"], ckpt["rows_done"], ckpt["rows_failed"]) == (4, 2, 2)
+
+
+def test_unparseable_pack_is_split(fake_services):
+    fake_services["max_pack"] = 2
+    runner = batch.BatchRunner("tmdb-key", pack=5, concurrency=1)
+    texts = ["a", "b", "c", "d", "e"]
+    assert runner._analyze_pack(texts) == [analysis_for(t) for t in texts]
+    assert fake_services["calls"] == [texts, ["a", "b"], ["c", "d", "e"], ["c"], ["d", "e"]]
+
+
+def test_unanswered_texts_are_repacked(monkeypatch):
+    calls = []
+
+    def analyze_moods_batch(texts):
+        calls.append(list(texts))
+        return [analysis_for(t) if t != "b" or len(texts) == 1 else None for t in texts]
+
+    monkeypatch.setattr(services, "analyze_moods_batch", analyze_moods_batch)
+    runner = batch.BatchRunner("tmdb-key", pack=3, concurrency=1)
+    assert runner._analyze_pack(["a", "b", "c"]) == [analysis_for(t) for t in "abc"]
+    assert calls == [["a", "b", "c"], ["b"]]
+
+
+def test_pack_size_is_capped():
+    assert batch.BatchRunner("tmdb-key", pack=500).pack == batch.MAX_PACK
+
+
+class FakeModel:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.prompts.append(prompt)
+        return type("Response", (), {"text": json.dumps(self.answer)})()
+
+
+def item(n, summary):
+    return {"id": n, "detected_moods": ["x"], "summary_text": summary,
+            "recommendations": [{"title": f"Film {summary}", "reason": "r"}]}
+
+
+def test_analyze_moods_batch_maps_ids(monkeypatch):
+    texts = [f"teks {uuid.uuid4().hex}" for _ in range(3)]
+    # Urutan jawaban acak, id 2 tidak ada
+    model = FakeModel([item(1, "kedua"), item(0, "pertama")])
+    monkeypatch.setattr(services, "get_model", lambda preset="recommendation": model)
+
+    results = services.analyze_moods_batch(texts)
+    assert results[0][0]["summary_text"] == "pertama"
+    assert results[1][0]["summary_text"] == "kedua"
+    assert results[1][1] == [{"title": "Film kedua", "reason": "r"}]
+    assert results[0][0]["source"] == "gemini" and "id" not in results[0][0]
+    assert results[2] is None
+
+    # Teks yang sudah terjawab diambil dari cache; hanya sisanya dikirim, dengan id baru
+    model.answer = [item(0, "ketiga")]
+    results = services.analyze_moods_batch(texts)
+    assert [r[0]["summary_text"] for r in results] == ["pertama", "kedua", "ketiga"]
+    assert texts[2] in model.prompts[1] and texts[0] not in model.prompts[1]
+
+
+def test_analyze_moods_batch_raises_on_invalid_json(monkeypatch):
+    model = FakeModel(None)
+    model.generate_content = lambda prompt, request_options=None, **kwargs: type("R", (), {"text": "[{"})()
+    monkeypatch.setattr(services, "get_model", lambda preset="recommendation": model)
+    with pytest.raises(ValueError):
+        services.analyze_moods_batch([f"teks {uuid.uuid4().hex}"])
@@ -0,0 +1,34 @@
+import json
+
+import chat_tools
+import tracing
+
+
+def movie(n):
+    return {"id": n, "title": f"Film {n}", "release_date": "2020-01-01", "vote_average": 7.25,
+            "overview": "kata " * 100, "poster_path": f"/{n}.jpg", "popularity": 12.5,
+            "backdrop_path": f"/b{n}.jpg", "genre_ids": [18, 35], "original_language": "en"}
+
+
+def test_compact_payload_tags_savings_on_the_tool_span():
+    movies = [movie(n) for n in range(3)]
+    before = chat_tools.payload_snapshot()
+    with tracing.span("tool") as sp:
+        out = chat_tools.compact_payload(movies)
+
+    sent = json.loads(out)
+    assert [m["id"] for m in sent] == [0, 1, 2]
+    assert "backdrop_path" not in sent[0]
+    assert sp.tags["sent_bytes"] == len(out.encode())
+    assert sp.tags["raw_bytes"] > sp.tags["sent_bytes"]
+    assert sp.tags["tokens_saved"] == (sp.tags["raw_bytes"] - sp.tags["sent_bytes"]) // chat_tools.BYTES_PER_TOKEN
+
+    after = chat_tools.payload_snapshot()
+    assert after["calls"] == before["calls"] + 1
+    assert after["tokens_saved"] - before["tokens_saved"] == sp.tags["tokens_saved"]
+
+
+def test_payload_totals_are_exported_in_metrics():
+    chat_tools.compact_payload([movie(1)])
+    text = tracing.registry.prometheus()
+    assert 'moodcine_tool_payload_total{metric="tokens_saved"}' in text
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import jobs
+import ratelimit
+
+
+def blocker(release, cancel_event=None):
+    release.wait(5)
+    return "blocker"
+
+
+def quick(cancel_event=None):
+    return "analysis"
+
+
+def test_background_jobs_do_not_hold_interactive_workers():
+    runner = jobs.JobRunner(max_workers=1, background_workers=1)
+    release = threading.Event()
+    try:
+        runner.submit("s", "scripts", blocker, release, priority=ratelimit.BACKGROUND)
+        runner.submit("s2", "scripts", blocker, release, priority=ratelimit.BACKGROUND)
+        job = runner.submit("s", "analysis", quick, timeout=1)
+        assert job.result(timeout=1) == "analysis"
+    finally:
+        release.set()
+
+
+def test_deadline_starts_when_job_runs():
+    runner = jobs.JobRunner(max_workers=1)
+    release = threading.Event()
+    try:
+        runner.submit("s1", "analysis", blocker, release)
+        job = runner.submit("s2", "analysis", quick, timeout=0.05)
+        time.sleep(0.15)
+        # Masih antre di pool yang penuh: belum berjalan, jadi belum timeout
+        assert job.stage == "queued"
+        assert job.elapsed() == 0.0
+        assert not job.expired()
+    finally:
+        release.set()
+    assert job.result(timeout=1) == "analysis"
+    assert not job.expired()
+
+
+def test_running_job_expires_after_timeout():
+    runner = jobs.JobRunner(max_workers=1)
+    release = threading.Event()
+    try:
+        job = runner.submit("s", "analysis", blocker, release, timeout=0.05)
+        time.sleep(0.15)
+        assert job.stage == "running"
+        assert job.expired()
+    finally:
+        release.set()
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+import ratelimit
+
+
+def retry_fast(e):
+    return False, 0.0
+
+
+def test_burst_then_refill_rate():
+    limiter = ratelimit.Limiter("t", rate=20, burst=2)
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+    assert time.monotonic() - start < 0.02
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.04
+
+
+def test_acquire_times_out_when_bucket_is_empty():
+    limiter = ratelimit.Limiter("t", rate=0.1, burst=1)
+    limiter.acquire()
+    with pytest.raises(ratelimit.RateLimitTimeout):
+        limiter.acquire(timeout=0.05)
+    assert limiter.metrics()["queue_timeouts"] == 1
+    assert limiter.metrics()["queued"] == 0
+
+
+def test_interactive_is_served_before_background():
+    limiter = ratelimit.Limiter("t", rate=10, burst=1)
+    limiter.acquire()
+    order = []
+
+    def take(priority, label):
+        limiter.acquire(priority, timeout=5)
+        order.append(label)
+
+    background = threading.Thread(target=take, args=(ratelimit.BACKGROUND, "background"))
+    background.start()
+    time.sleep(0.02)  # background sudah mengantre lebih dulu
+    interactive = threading.Thread(target=take, args=(ratelimit.INTERACTIVE, "interactive"))
+    interactive.start()
+    background.join()
+    interactive.join()
+    assert order == ["interactive", "background"]
+
+
+def test_pause_holds_every_caller():
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    limiter.pause(0.1)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_call_retries_classified_errors():
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert limiter.call(flaky, classify=retry_fast) == "ok"
+    assert len(attempts) == 3
+    assert limiter.metrics()["retries"] == 2
+
+
+def test_call_does_not_retry_unclassified_errors():
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    attempts = []
+
+    def broken(timeout):
+        attempts.append(timeout)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken, classify=lambda e: None)
+    assert len(attempts) == 1
+    assert limiter.metrics()["failures"] == 1
+
+
+def test_call_gives_up_after_max_retries():
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    attempts = []
+
+    def always_failing(timeout):
+        attempts.append(timeout)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        limiter.call(always_failing, classify=retry_fast)
+    assert len(attempts) == ratelimit.MAX_RETRIES + 1
+
+
+def test_attempt_timeout_is_remaining_budget(monkeypatch):
+    monkeypatch.setattr(ratelimit, "MIN_ATTEMPT_SECONDS", 0.01)
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    timeouts = []
+
+    def flaky(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) < 2:
+            time.sleep(0.1)
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert limiter.call(flaky, classify=retry_fast, budget=1.0) == "ok"
+    assert timeouts[0] <= 1.0
+    assert timeouts[1] <= timeouts[0] - 0.1
+
+
+def test_retry_stops_when_backoff_exceeds_budget():
+    limiter = ratelimit.Limiter("t", rate=1000, burst=10)
+    attempts = []
+
+    def throttled(timeout):
+        attempts.append(timeout)
+        raise ConnectionError("429")
+
+    start = time.monotonic()
+    with pytest.raises(ConnectionError):
+        limiter.call(throttled, classify=lambda e: (True, 5.0), budget=2.0)
+    assert len(attempts) == 1
+    assert time.monotonic() - start < 0.5
+    # 429 tetap menahan bucket untuk pemanggil lain
+    assert limiter.metrics()["throttled"] == 1
+
+
+def test_exhausted_budget_fails_before_calling():
+    limiter = ratelimit.Limiter("t", rate=0.1, burst=1)
+    limiter.acquire()
+    called = []
+    start = time.monotonic()
+    with pytest.raises(ratelimit.RateLimitTimeout):
+        limiter.call(lambda timeout: called.append(timeout), budget=1.2)
+    assert not called
+    assert time.monotonic() - start < 1.2
+
+
+def test_parse_retry_after():
+    assert ratelimit.parse_retry_after("3") == 3.0
+    assert ratelimit.parse_retry_after("-1") == 0.0
+    assert ratelimit.parse_retry_after("") is None
+    assert ratelimit.parse_retry_after("soon") is None
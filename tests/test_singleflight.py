@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import singleflight
+
+
+def run_concurrently(n, fn):
+    results = [None] * n
+    errors = [None] * n
+    start = threading.Barrier(n)
+
+    def worker(i):
+        start.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    group = singleflight.Group()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results, errors = run_concurrently(10, lambda: group.do("k", slow, timeout=5))
+    assert len(calls) == 1
+    assert errors == [None] * 10
+    assert all(r == {"value": 42} for r in results)
+    assert group.in_flight() == 0
+
+
+def test_leader_error_reaches_every_caller():
+    group = singleflight.Group()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("quota")
+
+    _, errors = run_concurrently(5, lambda: group.do("k", failing, timeout=5))
+    assert len(calls) == 1
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert group.in_flight() == 0
+
+
+def test_different_keys_do_not_coalesce():
+    group = singleflight.Group()
+    assert group.do("a", lambda: 1) == 1
+    assert group.do("b", lambda: 2) == 2
+
+
+def test_key_is_released_after_finish():
+    group = singleflight.Group()
+    calls = []
+    for _ in range(3):
+        group.do("k", lambda: calls.append(1))
+    assert len(calls) == 3
+
+
+def test_follower_times_out_while_leader_runs():
+    group = singleflight.Group()
+    call, leader = group.begin("k")
+    assert leader
+    follower, leader = group.begin("k")
+    assert not leader and follower is call
+    with pytest.raises(singleflight.FlightTimeout):
+        group.wait(follower, timeout=0.05)
+    group.finish("k", call, result="late")
+    assert group.wait(follower, timeout=0) == "late"
+
+
+def test_group_default_timeout():
+    group = singleflight.Group(timeout=0.05)
+    call, _ = group.begin("k")
+    with pytest.raises(singleflight.FlightTimeout):
+        group.wait(call)
@@ -0,0 +1,46 @@
+import json
+
+from services import _iter_json_array_objects
+
+
+def parse(chunks):
+    return list(_iter_json_array_objects(chunks))
+
+
+def test_objects_from_single_chunk():
+    text = '[{"title": "Up", "reason": "a"}, {"title": "Her", "reason": "b"}]'
+    assert parse([text]) == [{"title": "Up", "reason": "a"}, {"title": "Her", "reason": "b"}]
+
+
+def test_objects_split_across_chunks_at_every_position():
+    recs = [{"title": "Inside Out", "reason": "lucu"}, {"title": "Coco", "reason": "haru"}]
+    text = json.dumps(recs)
+    for size in range(1, len(text) + 1):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert parse(chunks) == recs
+
+
+def test_markdown_fence_is_ignored():
+    text = '```json\n[{"title": "Up", "reason": "x"}]\n```'
+    assert parse([text]) == [{"title": "Up", "reason": "x"}]
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    recs = [{"title": 'Say "}{" twice', "reason": "back\\slash } {"}]
+    assert parse([json.dumps(recs)]) == recs
+
+
+def test_nested_objects_yield_outer_object_only():
+    text = '[{"title": "Up", "meta": {"year": 2009, "tags": [{"k": 1}]}}]'
+    assert parse([text]) == [{"title": "Up", "meta": {"year": 2009, "tags": [{"k": 1}]}}]
+
+
+def test_object_is_yielded_before_array_closes():
+    gen = _iter_json_array_objects(iter(['[{"title": "Up"}', ', {"title": "He']))
+    assert next(gen) == {"title": "Up"}
+    assert list(gen) == []
+
+
+def test_invalid_object_is_skipped():
+    text = '[{"title": "Up",}, {"title": "Her"}]'
+    assert parse([text]) == [{"title": "Her"}]
@@ -0,0 +1,47 @@
+import pytest
+
+import title_index
+
+
+def movie(movie_id, title, year="2000", popularity=10.0):
+    return {"id": movie_id, "title": title, "original_title": title, "release_date": f"{year}-01-01",
+            "popularity": popularity, "poster_path": f"/{movie_id}.jpg", "vote_average": 7.0}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = title_index.TitleIndex(str(tmp_path / "titles.sqlite3"))
+    index.add_movies([
+        movie(1, "Toy Story 2", "1999", 80),
+        movie(2, "Spider-Man 2", "2004", 60),
+        movie(3, "Before Sunrise", "1995", 30),
+        movie(4, "Rocky II", "1979", 20),
+        movie(5, "The Matrix", "1999", 90),
+    ])
+    return index
+
+
+@pytest.mark.parametrize("title", ["Toy Story 3", "Toy Story 4", "Spider-Man 3", "Before Sunset", "Toy Story"])
+def test_sequels_and_near_titles_are_not_local_hits(index, title):
+    assert index.lookup(title) is None
+
+
+@pytest.mark.parametrize("title, movie_id", [
+    ("Toy Story 2", 1),
+    ("toy story 2", 1),
+    ("Spiderman 2", 2),
+    ("Rocky II", 4),
+    ("Matrix", 5),
+])
+def test_same_title_is_a_local_hit(index, title, movie_id):
+    found, complete = index.lookup(title)
+    assert found["id"] == movie_id and complete
+
+
+def test_best_match_respects_sequel_numbers():
+    results = [movie(10, "Toy Story 4", "2019"), movie(11, "Toy Story 3", "2010"), movie(12, "Toy Story", "1995")]
+    assert title_index.best_match("Toy Story 3", results)["id"] == 11
+    assert title_index.best_match("Rocky 2", [movie(4, "Rocky II", "1979")])["id"] == 4
+    # Tidak ada hasil dengan nomor yang sama: lebih baik tidak ada kartu daripada film yang salah
+    assert title_index.best_match("Toy Story 5", results[:2]) is None
+    assert title_index.best_match("Toy Story 5", []) is None
@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import posters
+import services
+
+
+def fake_details(title, api_key):
+    # "Toy Story 3" dan "Toy Story Three" jatuh ke film yang sama
+    movie_id = 3 if title.startswith("Toy Story") else hash(title) % 1000 + 10
+    return {"id": movie_id, "title": title, "poster_path": None}
+
+
+def test_iter_watchlist_yields_one_card_per_tmdb_id(monkeypatch):
+    monkeypatch.setattr(services, "search_tmdb_details", fake_details)
+    monkeypatch.setattr(posters, "prefetch", lambda *args, **kwargs: None)
+    recs = [{"title": "Toy Story 3", "reason": "a"}, {"title": "Up", "reason": "b"},
+            {"title": "Toy Story Three", "reason": "c"}]
+    cards = list(services.iter_watchlist("", "key", candidates=recs))
+    assert sorted(c["id"] for c in cards) == sorted({3, fake_details("Up", None)["id"]})
+
+
+def test_enrich_recommendations_dedupes_by_id(monkeypatch):
+    monkeypatch.setattr(services, "search_tmdb_details", fake_details)
+    recs = [{"title": "Toy Story 3", "reason": "a"}, {"title": "Toy Story Three", "reason": "c"}]
+    cards = services.enrich_recommendations(recs, "key")
+    assert [(c["id"], c["reason"]) for c in cards] == [(3, "a")]
+
+
+def slow_details(seconds):
+    def search(title, api_key):
+        time.sleep(seconds)
+        return {"id": title, "title": title, "poster_path": None}
+    return search
+
+
+def test_queued_lookups_are_not_dropped_by_the_deadline(monkeypatch):
+    # Pool bersama penuh: tiap lookup cepat, tapi total antrean melebihi deadline
+    monkeypatch.setattr(services, "_tmdb_pool", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(services, "search_tmdb_details", slow_details(0.1))
+    recs = [{"title": t, "reason": ""} for t in ("a", "b", "c", "d")]
+    cards = services.enrich_recommendations(recs, "key", deadline=0.25)
+    assert [c["id"] for c in cards] == ["a", "b", "c", "d"]
+
+
+def test_running_lookup_past_its_deadline_is_dropped(monkeypatch):
+    monkeypatch.setattr(services, "search_tmdb_details", slow_details(1.0))
+    start = time.monotonic()
+    assert services.enrich_recommendations([{"title": "a"}], "key", deadline=0.1) == []
+    assert time.monotonic() - start < 0.5
+
+
+def test_candidate_pool_cancels_unfinished_pages(monkeypatch):
+    calls = []
+
+    def slow_discover(endpoint, params, api_key):
+        calls.append(params["page"])
+        time.sleep(0.3)
+        return {"results": [{"id": params["page"], "title": "x"}]}
+
+    monkeypatch.setattr(services, "_tmdb_pool", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(services.cache, "tmdb_get", slow_discover)
+    monkeypatch.setattr(services, "TMDB_DEADLINE", 0.1)
+    monkeypatch.setattr(services, "TMDB_QUEUE_GRACE", 0)
+    analysis = {"genre_alignment": [{"genre": "Drama", "score": 90}]}
+    assert services.fetch_candidate_pool(analysis, "key", pool_size=100) == []
+    time.sleep(0.5)
+    # Halaman yang belum sempat jalan dibatalkan, bukan dikerjakan di belakang
+    assert calls == [1]
@@ -0,0 +1,268 @@
+# title_index.py
+"""
+Index judul TMDB lokal (SQLite + FTS5) untuk resolusi judul tanpa network.
+
+Dibangun dari file bulk export TMDB (JSON per baris, boleh .gz) dan ikut
+belajar dari setiap hasil /search/movie yang lewat. Pemakaian CLI:
+
+    python title_index.py build movie_ids_10_17_2026.json.gz [file lain ...]
+"""
+import difflib
+import gzip
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import unicodedata
+
+TITLE_INDEX_PATH = os.getenv("TITLE_INDEX_PATH", os.path.join(".cache", "titles.sqlite3"))
+
+# Kemiripan judul minimal agar hasil live search dianggap cocok
+MIN_TITLE_SIMILARITY = 0.85
+
+_YEAR_SUFFIX = re.compile(r"^(.*?)\s*\((\d{4})\)\s*$")
+_ROMAN = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9, "x": 10}
+
+
+def normalize_title(title):
+    """'Amélie (Le Fabuleux…)' -> 'amelie le fabuleux'"""
+    text = unicodedata.normalize("NFKD", str(title or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def split_year(title):
+    """'Parasite (2019)' -> ('Parasite', '2019'); tanpa tahun -> (title, None)"""
+    match = _YEAR_SUFFIX.match(title or "")
+    if match:
+        return match.group(1), match.group(2)
+    return title, None
+
+
+def _strip_article(norm):
+    return re.sub(r"^(the|a|an) ", "", norm)
+
+
+def _numbers(norm):
+    """Token angka/romawi sebuah judul: 'rocky ii' dan 'rocky 2' -> ('2',)"""
+    return tuple(str(_ROMAN.get(tok, tok)) for tok in norm.split() if tok.isdigit() or tok in _ROMAN)
+
+
+def _title_key(norm):
+    """Judul tanpa artikel awal dan spasi: 'the spider man' == 'spiderman'"""
+    return _strip_article(norm).replace(" ", "")
+
+
+def _similarity(query_norm, name_norm):
+    if not name_norm:
+        return 0.0
+    # Sekuel beda nomor bukan film yang sama walau teksnya hampir identik
+    if _numbers(query_norm) != _numbers(name_norm):
+        return 0.0
+    return difflib.SequenceMatcher(None, _strip_article(query_norm), _strip_article(name_norm)).ratio()
+
+
+def _score(query_norm, year, movie):
+    """Skor kecocokan kandidat: kemiripan judul + bonus tahun + sedikit popularitas"""
+    similarity = max(
+        _similarity(query_norm, normalize_title(movie.get("title"))),
+        _similarity(query_norm, normalize_title(movie.get("original_title"))),
+    )
+    score = similarity
+    movie_year = (movie.get("release_date") or "")[:4]
+    if year and movie_year:
+        gap = abs(int(year) - int(movie_year))
+        score += 0.3 if gap == 0 else 0.15 if gap == 1 else -0.3
+    score += math.log1p(movie.get("popularity") or 0) / 100
+    return similarity, score
+
+
+def best_match(title, results, year=None):
+    """Kandidat terbaik dari daftar hasil TMDB (bukan sekadar results[0])"""
+    query_norm = normalize_title(title)
+    best, best_score = None, None
+    for movie in results or []:
+        similarity, score = _score(query_norm, year, movie)
+        if similarity < MIN_TITLE_SIMILARITY:
+            continue
+        if best_score is None or score > best_score:
+            best, best_score = movie, score
+    if best is None:
+        # Tidak ada yang mirip: hasil teratas TMDB, asal nomor sekuelnya tidak bertentangan
+        numbers = _numbers(query_norm)
+        for movie in results or []:
+            if _numbers(normalize_title(movie.get("title") or movie.get("original_title"))) == numbers:
+                return movie
+    return best
+
+
+def _is_complete(record):
+    """Record dari export harian hanya punya id/original_title/popularity"""
+    return "poster_path" in record and "vote_average" in record
+
+
+class TitleIndex:
+    def __init__(self, path=TITLE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS movies (
+                id INTEGER PRIMARY KEY,
+                norm_title TEXT,
+                norm_original TEXT,
+                year TEXT,
+                popularity REAL,
+                complete INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_norm_title ON movies(norm_title)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_norm_original ON movies(norm_original)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(norm_title, norm_original)"
+        )
+        # FTS selalu sinkron dengan tabel movies lewat trigger
+        self._conn.executescript(
+            """CREATE TRIGGER IF NOT EXISTS movies_ai AFTER INSERT ON movies BEGIN
+                INSERT INTO movies_fts (rowid, norm_title, norm_original)
+                VALUES (new.id, new.norm_title, new.norm_original);
+            END;
+            CREATE TRIGGER IF NOT EXISTS movies_au AFTER UPDATE ON movies BEGIN
+                DELETE FROM movies_fts WHERE rowid = old.id;
+                INSERT INTO movies_fts (rowid, norm_title, norm_original)
+                VALUES (new.id, new.norm_title, new.norm_original);
+            END;"""
+        )
+        self._conn.commit()
+
+    def add_movies(self, movies):
+        """Upsert record film (format hasil search/discover TMDB atau export harian)"""
+        rows = [
+            (
+                m["id"],
+                normalize_title(m.get("title") or m.get("original_title")),
+                normalize_title(m.get("original_title")),
+                (m.get("release_date") or "")[:4],
+                m.get("popularity") or 0,
+                int(_is_complete(m)),
+                json.dumps(m),
+            )
+            for m in movies
+            if m.get("id") and not m.get("adult")
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            # Record export yang minim tidak boleh menimpa record yang sudah lengkap
+            self._conn.executemany(
+                """INSERT INTO movies VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    norm_title = excluded.norm_title, norm_original = excluded.norm_original,
+                    year = excluded.year, popularity = excluded.popularity,
+                    complete = excluded.complete, data = excluded.data
+                WHERE excluded.complete >= movies.complete""",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def lookup(self, title, year=None):
+        """
+        Cari judul secara lokal: exact match dulu, lalu kandidat FTS5 yang
+        judulnya sama setelah artikel/spasi/tanda baca diabaikan. Judul yang
+        hanya mirip ("Before Sunset" vs "Before Sunrise", "Toy Story 3" vs
+        "Toy Story 2") tidak dianggap cocok: return None supaya pemanggil
+        memakai live search. Return (record, complete) atau None.
+        """
+        query_norm = normalize_title(title)
+        if not query_norm:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data, complete FROM movies WHERE norm_title = ? OR norm_original = ?",
+                (query_norm, query_norm),
+            ).fetchall()
+            if not rows:
+                # Prefix per token (OR): kandidat yang beda spasi/tanda baca ("spiderman")
+                fts_query = " OR ".join(f'"{tok[:4]}"*' for tok in query_norm.split())
+                rows = self._conn.execute(
+                    "SELECT m.data, m.complete FROM movies_fts f JOIN movies m ON m.id = f.rowid "
+                    "WHERE movies_fts MATCH ? ORDER BY bm25(movies_fts) LIMIT 20",
+                    (fts_query,),
+                ).fetchall()
+        candidates = [(json.loads(data), bool(complete)) for data, complete in rows]
+
+        query_key = _title_key(query_norm)
+        best, best_score = None, None
+        for movie, complete in candidates:
+            names = (normalize_title(movie.get("title")), normalize_title(movie.get("original_title")))
+            if query_key not in {_title_key(name) for name in names if name}:
+                continue
+            _, score = _score(query_norm, year, movie)
+            if best_score is None or score > best_score:
+                best, best_score = (movie, complete), score
+        return best
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM movies").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM movies")
+            self._conn.execute("DELETE FROM movies_fts")
+            self._conn.commit()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Index judul tunggal per proses"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = TitleIndex()
+    return _index
+
+
+def _iter_export(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def build(paths, batch_size=5000):
+    """Isi index dari file export TMDB (streaming, per batch)"""
+    index = get_index()
+    total = 0
+    for path in paths:
+        batch = []
+        for record in _iter_export(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                total += index.add_movies(batch)
+                batch = []
+        total += index.add_movies(batch)
+        print(f"{path}: {total} film terindeks")
+    return total
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        print(__doc__)
+        sys.exit(1)
+    build(sys.argv[2:])
@@ -0,0 +1,302 @@
+# tracing.py
+# Span berwaktu untuk setiap panggilan service & tool, ditandai session,
+# stage, upstream, status cache dan outcome. Histogram disimpan di proses
+# (p50/p95/p99) dan bisa diekspor sebagai teks Prometheus (METRICS_PORT)
+# dan/atau file JSONL yang dirotasi (TRACE_LOG_PATH).
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = endpoint mati
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")      # kosong = tanpa file JSONL
+TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024
+TRACE_LOG_BACKUPS = 3
+
+logger = logging.getLogger(__name__)
+
+# Bucket histogram Prometheus (detik)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 2048  # durasi terakhir per seri, untuk persentil
+
+_session = contextvars.ContextVar("trace_session", default=None)
+_stage = contextvars.ContextVar("trace_stage", default=None)
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    def __init__(self, name, upstream=None, **tags):
+        parent = _current.get()
+        self.id = uuid.uuid4().hex[:16]
+        self.parent = parent.id if parent else None
+        self.name = name
+        self.tags = {
+            "session": _session.get(),
+            "stage": _stage.get(),
+            "upstream": upstream,
+            "cache": None,
+            "outcome": "ok",
+        }
+        self.tags.update(tags)
+        self.ts = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            registry.record(self)
+
+
+class _Series:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def add(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                self.buckets[i] += 1
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class Registry:
+    """Histogram per (span, upstream, cache, outcome); session tidak jadi label"""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def record(self, span):
+        key = (span.name, span.tags.get("upstream") or "", span.tags.get("cache") or "", span.tags.get("outcome") or "")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(span.duration)
+        if self._log is not None:
+            self._log.info(json.dumps({
+                "ts": round(span.ts, 3), "span": span.name, "id": span.id, "parent": span.parent,
+                "duration_ms": round(span.duration * 1000, 2), **span.tags,
+            }, default=str))
+
+    def snapshot(self):
+        """{"name|upstream|cache|outcome": {count, mean_ms, p50_ms, p95_ms, p99_ms}}"""
+        with self._lock:
+            items = list(self._series.items())
+            result = {}
+            for key, s in items:
+                q = s.quantiles()
+                result["|".join(key)] = {
+                    "count": s.count,
+                    "mean_ms": round(s.sum / s.count * 1000, 2),
+                    "p50_ms": round(q[0.5] * 1000, 2),
+                    "p95_ms": round(q[0.95] * 1000, 2),
+                    "p99_ms": round(q[0.99] * 1000, 2),
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def prometheus(self):
+        lines = [
+            "# HELP moodcine_span_seconds Durasi span service/tool",
+            "# TYPE moodcine_span_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP moodcine_span_quantile_seconds Persentil durasi span (jendela terakhir)",
+            "# TYPE moodcine_span_quantile_seconds gauge",
+        ]
+        with self._lock:
+            for (name, upstream, cache_status, outcome), s in sorted(self._series.items()):
+                labels = f'span="{name}",upstream="{upstream}",cache="{cache_status}",outcome="{outcome}"'
+                for le, n in zip(BUCKETS, s.buckets):
+                    lines.append(f'moodcine_span_seconds_bucket{{{labels},le="{le}"}} {n}')
+                lines.append(f'moodcine_span_seconds_bucket{{{labels},le="+Inf"}} {s.count}')
+                lines.append(f"moodcine_span_seconds_sum{{{labels}}} {s.sum:.6f}")
+                lines.append(f"moodcine_span_seconds_count{{{labels}}} {s.count}")
+                for q, v in s.quantiles().items():
+                    quantile_lines.append(f'moodcine_span_quantile_seconds{{{labels},quantile="{q}"}} {v:.6f}')
+        lines += quantile_lines
+        try:
+            import ratelimit
+            lines.append("# TYPE moodcine_ratelimit gauge")
+            for upstream, m in ratelimit.metrics().items():
+                for metric, value in m.items():
+                    lines.append(f'moodcine_ratelimit{{upstream="{upstream}",metric="{metric}"}} {value}')
+        except Exception as e:
+            logger.warning("metrik rate limit gagal dibaca: %r", e)
+        # Penghematan payload tool chat, hanya jika chat_tools dipakai di proses ini
+        chat_tools = sys.modules.get("chat_tools")
+        if chat_tools is not None:
+            lines.append("# TYPE moodcine_tool_payload_total counter")
+            for metric, value in chat_tools.payload_snapshot().items():
+                lines.append(f'moodcine_tool_payload_total{{metric="{metric}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def open_log(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        trace_log = logging.getLogger("moodcine.traces")
+        trace_log.setLevel(logging.INFO)
+        trace_log.propagate = False
+        handler = RotatingFileHandler(path, maxBytes=TRACE_LOG_MAX_BYTES, backupCount=TRACE_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        trace_log.addHandler(handler)
+        self._log = trace_log
+
+
+registry = Registry()
+
+
+def set_context(session=None, stage=None):
+    """Tandai span berikutnya di context ini (thread script Streamlit / job)"""
+    if session is not None:
+        _session.set(session)
+    if stage is not None:
+        _stage.set(stage)
+
+
+def span(name, upstream=None, **tags):
+    """Context manager: with tracing.span("x", upstream="tmdb") as sp: ..."""
+    return _SpanContext(name, upstream, tags)
+
+
+class _SpanContext:
+    def __init__(self, name, upstream, tags):
+        self.span = Span(name, upstream, **tags)
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.span.tag(outcome="error", error=exc_type.__name__)
+        self.span.finish()
+        return False
+
+
+def tag(**tags):
+    """Tambahkan tag ke span yang sedang aktif (mis. cache="hit", outcome="fallback")"""
+    current = _current.get()
+    if current is not None:
+        current.tag(**tags)
+
+
+def traced(name=None, upstream=None):
+    """Decorator span untuk fungsi biasa maupun generator (span = sampai stream habis)"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                sp = Span(span_name, upstream)
+                gen = fn(*args, **kwargs)
+                first = True
+                try:
+                    while True:
+                        token = _current.set(sp)
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            return
+                        finally:
+                            _current.reset(token)
+                        if first:
+                            sp.tag(first_item_ms=round((time.perf_counter() - sp._start) * 1000, 2))
+                            first = False
+                        yield item
+                except GeneratorExit:
+                    sp.tag(outcome="cancelled")
+                    gen.close()
+                    raise
+                except BaseException as e:
+                    sp.tag(outcome="error", error=type(e).__name__)
+                    raise
+                finally:
+                    sp.finish()
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, upstream):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def submit(pool, fn, *args, **kwargs):
+    """pool.submit yang membawa context (session/stage/span induk) ke thread pool"""
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def start_exporter(port=METRICS_PORT, log_path=TRACE_LOG_PATH):
+    """Nyalakan endpoint /metrics dan/atau log JSONL sekali per proses"""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+        if log_path:
+            registry.open_log(log_path)
+        if port:
+            try:
+                server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("endpoint metrics gagal dibuka di port %s: %r", port, e)
+                return
+            threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+            logger.info("metrics di http://127.0.0.1:%s/metrics", port)
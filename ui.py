@@ -1,9 +1,28 @@
 # ui.py
 import streamlit as st
+import html
+import re
+from functools import lru_cache
 import services 
+import posters
 
 def inject_style(css_string):
-    st.markdown(css_string, unsafe_allow_html=True)
+    st.markdown(_minify_css(css_string), unsafe_allow_html=True)
+
+@lru_cache(maxsize=8)
+def _minify_css(css_string):
+    """CSS tanpa komentar & spasi berlebih, dihitung sekali per proses"""
+    css = re.sub(r"/\*.*?\*/", "", css_string, flags=re.DOTALL)
+    return re.sub(r"\s*\n\s*", "\n", css).strip()
+
+def _poster(movie, context):
+    """Poster ukuran sesuai konteks; placeholder lokal dipilih di sini, bukan di data"""
+    if movie.get('poster_path'):
+        return posters.poster_file(movie['poster_path'], context)
+    return movie.get('poster') or posters.PLACEHOLDER_FILE
+
+def _card_title_html(title):
+    return f"<div style='font-weight:600; margin-top:5px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis;'>{html.escape(title)}</div>"
 
 def render_header():
     """Header Minimalis Kiri Atas"""
@@ -113,28 +132,61 @@ def render_search_area():
 def show_details_modal(movie, mood_context):
     col_img, col_txt = st.columns([1, 1.5])
     with col_img:
-        st.image(movie['poster'], use_container_width=True)
+        st.image(_poster(movie, "modal"), use_container_width=True)
         st.markdown(f"<div style='background:#1e293b; color:#4ade80; padding:8px; border-radius:6px; text-align:center; margin-top:10px; font-weight:bold; font-size:0.9rem;'>{movie['match']}% Match</div>", unsafe_allow_html=True)
+        if movie.get('score_breakdown'):
+            b = movie['score_breakdown']
+            st.caption(f"Genre {int(b['genre'] * 100)}% • Rating {int(b['rating'] * 100)}% • Populer {int(b['popularity'] * 100)}%")
     with col_txt:
         st.markdown(f"<h2 style='margin:0; color:white;'>{movie['title']}</h2>", unsafe_allow_html=True)
         st.caption(f"{movie['year']} • ⭐ {movie['rating']}")
         st.write(movie['overview'])
         st.markdown("---")
-        with st.spinner("AI Director's Cut..."):
-            script = services.generate_creative_script(movie['title'], mood_context)
+        script = services.get_cached_script(movie['id'], mood_context)
+        if script:
             st.info(f"\"{script}\"", icon="✨")
+        else:
+            # Belum disiapkan batch background: stream token demi token
+            placeholder = st.empty()
+            placeholder.caption("AI Director's Cut...")
+            script = ""
+            for token in services.stream_creative_script(movie['title'], mood_context, movie['id']):
+                script += token
+                placeholder.info(f"\"{script}\"", icon="✨")
         st.link_button("Watch Trailer", f"https://www.youtube.com/results?search_query={movie['title']}+trailer", use_container_width=True)
 
+def _unique_by_id(movies_data):
+    """Satu kartu per id TMDB (key tombol "Details" memakai id)"""
+    seen = set()
+    unique = []
+    for movie in movies_data:
+        if movie['id'] not in seen:
+            seen.add(movie['id'])
+            unique.append(movie)
+    return unique
+
+@st.fragment
 def render_movie_grid(movies_data, mood_context):
+    """Grid hasil sebagai fragment: klik "Details" hanya me-rerun grid + dialog"""
     st.markdown("<br><hr style='border-color: #334155;'><br>", unsafe_allow_html=True)
     st.markdown(f"<h3 style='text-align:center;'>Curated for: <span style='color:#dc2626'>{mood_context}</span></h3><br>", unsafe_allow_html=True)
     
     cols = st.columns(4)
-    for idx, movie in enumerate(movies_data):
+    for idx, movie in enumerate(_unique_by_id(movies_data)):
         with cols[idx % 4]:
             with st.container(border=True):
-                st.image(movie['poster'], use_container_width=True)
-                st.markdown(f"<div style='font-weight:600; margin-top:5px; white-space:nowrap; overflow:hidden; text-overflow:ellipsis;'>{movie['title']}</div>", unsafe_allow_html=True)
+                st.image(_poster(movie, "grid"), use_container_width=True)
+                st.markdown(_card_title_html(movie['title']), unsafe_allow_html=True)
                 st.caption(f"{movie['year']} • ⭐ {movie['rating']}")
                 if st.button("Details", key=f"btn_{movie['id']}", use_container_width=True):
-                    show_details_modal(movie, mood_context)
\ No newline at end of file
+                    show_details_modal(movie, mood_context)
+
+def render_movie_preview(movies_data):
+    """Grid sementara tanpa tombol, diisi kartu demi kartu selama pipeline berjalan"""
+    cols = st.columns(4)
+    for idx, movie in enumerate(movies_data):
+        with cols[idx % 4]:
+            with st.container(border=True):
+                st.image(_poster(movie, "grid"), use_container_width=True)
+                st.markdown(_card_title_html(movie['title']), unsafe_allow_html=True)
+                st.caption(f"{movie['year']} • ⭐ {movie['rating']}")